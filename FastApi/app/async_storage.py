@@ -0,0 +1,36 @@
+from typing import Callable, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+
+class AsyncStorage:
+    """How async endpoints call the synchronous repositories.
+
+    In-memory reads and writes are a few dict and list operations, far
+    cheaper than the hop to a worker thread and back, so they run inline
+    on the event loop. Calls that can block, on SQLite I/O or on waiting
+    for the journal to reach disk, go to the threadpool instead.
+
+    Inline calls may still take a store's shard lock. Those are only held
+    for the length of an in-memory operation, never across I/O.
+
+    A read or write passed ``large=True`` goes to the threadpool whatever
+    the backend: it handles enough items that even in memory it would stall
+    every other request on the loop for milliseconds.
+    """
+
+    def __init__(self, reads_block: bool, writes_block: bool):
+        self.reads_block = reads_block
+        self.writes_block = writes_block
+
+    async def read(self, fn: Callable[..., T], *args, large: bool = False) -> T:
+        if self.reads_block or large:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def write(self, fn: Callable[..., T], *args, large: bool = False) -> T:
+        if self.writes_block or large:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
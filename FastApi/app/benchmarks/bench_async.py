@@ -0,0 +1,177 @@
+"""Sync (threadpool) against async (inline) endpoints over the same
+in-memory ItemStore, at 1,000 concurrent connections.
+
+Both apps serve GET /items/{item_id} and POST /items the way main.py does,
+differing only in ``def`` against ``async def``. Each runs under uvicorn in
+its own process and is driven over real connections, so requests queue as
+they would in production (in-process ASGI transports run an async handler
+to completion without ever queueing it). The client shares the machine,
+so compare the two rows rather than reading them as absolute capacity.
+
+Run from FastApi/app:  python benchmarks/bench_async.py [requests]
+"""
+
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from serialization import TrustedJSONResponse
+from store import ItemStore
+
+CONCURRENCY = 1_000
+SEED_ITEMS = 10_000
+WRITE_SHARE = 0.2
+
+
+class NewItem(BaseModel):
+    name: str
+    price: float
+
+
+def build_app(store: ItemStore, use_async: bool) -> FastAPI:
+    app = FastAPI()
+
+    def create(item: NewItem):
+        new_item = item.model_dump()
+        new_item.update(description=None, owner="bench", created_at=datetime.utcnow())
+        return TrustedJSONResponse(store.create(new_item), status_code=201)
+
+    def get(item_id: int):
+        return TrustedJSONResponse(store.get(item_id))
+
+    if use_async:
+
+        async def create_async(item: NewItem):
+            return create(item)
+
+        async def get_async(item_id: int):
+            return get(item_id)
+
+        app.post("/items")(create_async)
+        app.get("/items/{item_id}")(get_async)
+    else:
+        app.post("/items")(create)
+        app.get("/items/{item_id}")(get)
+    return app
+
+
+def seed(store: ItemStore) -> None:
+    now = datetime.utcnow()
+    store.create_many(
+        [
+            {
+                "name": f"item-{i}",
+                "description": None,
+                "price": 1.0,
+                "owner": "bench",
+                "created_at": now,
+            }
+            for i in range(SEED_ITEMS)
+        ]
+    )
+
+
+def serve(variant: str, port: int) -> None:
+    store = ItemStore()
+    seed(store)
+    app = build_app(store, variant == "async")
+    # Queued requests can leave connections idle past uvicorn's default
+    # keep-alive timeout, and reusing one it just closed fails.
+    uvicorn.run(
+        app, port=port, log_level="warning", access_log=False, timeout_keep_alive=120
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive(base_url: str, requests: int):
+    rng = random.Random(1)
+    latencies = []
+    remaining = requests
+    errors = 0
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    if rng.random() < WRITE_SHARE:
+                        await client.post("/items", json={"name": "new", "price": 2.0})
+                    else:
+                        await client.get(f"/items/{rng.randint(1, SEED_ITEMS)}")
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1e3
+
+    return len(latencies) / elapsed, pct(50), pct(99), pct(99.9), errors
+
+
+def run(variant: str, requests: int):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve", variant, str(port)]
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        while True:
+            try:
+                httpx.get(f"{base_url}/items/1")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        return asyncio.run(drive(base_url, requests))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2], int(sys.argv[3]))
+        return
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 30_000
+    print(f"{requests} requests, {CONCURRENCY} concurrent, {WRITE_SHARE:.0%} writes")
+    print(
+        f"{'':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9}"
+        f" {'errors':>7}"
+    )
+    for variant in ("sync", "async"):
+        rps, p50, p99, p999, errors = run(variant, requests)
+        print(
+            f"{variant:>6} {rps:>8.0f} {p50:>8.1f} {p99:>8.1f} {p999:>9.1f}"
+            f" {errors:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Change feed fan-out: what a write pays to publish, and how long until
+every subscriber has the change, for growing numbers of subscribers.
+
+Run from FastApi/app:  python benchmarks/bench_change_feed.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from changes import ChangeFeed
+
+SUBSCRIBERS = (10, 100, 1_000, 10_000)
+WRITES = 20
+ITEM = {"id": 1, "name": "item", "description": None, "price": 9.99, "owner": "bench"}
+
+
+async def run(count):
+    feed = ChangeFeed(capacity=WRITES)
+    streams = [feed.subscribe("bench") for _ in range(count)]
+    for stream in streams:
+        await stream.__anext__()
+    publish_times = []
+    delivery_times = []
+    for _ in range(WRITES):
+        reads = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        # Let every subscriber get to waiting for the next change.
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        def publish():
+            # CPU time of the writing thread: wall time would also count the
+            # event loop taking the GIL to deliver the change meanwhile.
+            start = time.thread_time()
+            feed.publish("bench", "updated", [ITEM])
+            publish_times.append(time.thread_time() - start)
+
+        # Writes come from the threadpool, as in the app.
+        start = time.perf_counter()
+        thread = threading.Thread(target=publish)
+        thread.start()
+        await asyncio.gather(*reads)
+        delivery_times.append(time.perf_counter() - start)
+        thread.join()
+    for stream in streams:
+        await stream.aclose()
+    return (
+        sum(publish_times) / WRITES * 1e6,
+        sum(delivery_times) / WRITES * 1e3,
+    )
+
+
+def main():
+    print(
+        f"{'subscribers':>12} {'publish CPU (us)':>17} {'all delivered (ms)':>20}"
+        f" {'per subscriber (us)':>20}"
+    )
+    for count in SUBSCRIBERS:
+        publish, delivered = asyncio.run(run(count))
+        print(
+            f"{count:>12} {publish:>17.1f} {delivered:>20.2f}"
+            f" {delivered * 1e3 / count:>20.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
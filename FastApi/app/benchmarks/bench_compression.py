@@ -0,0 +1,129 @@
+"""CPU cost of response compression against the bytes it saves.
+
+Runs CompressionMiddleware over GET /items-shaped bodies: JSON pages and
+NDJSON streams sent in chunks of STREAM_CHUNK_SIZE lines, like main.py
+sends them. Items get varied names, descriptions and prices, so the
+ratios are not flattered by repetitive data.
+
+Run from FastApi/app:  python benchmarks/bench_compression.py
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import CompressionMiddleware
+from serialization import dumps
+
+PAGE_SIZES = (10, 100, 1000)
+LEVELS = (1, 6, 9)
+STREAM_CHUNK_SIZE = 500
+ROUNDS = 50
+WORDS = (
+    "red blue green steel wooden compact deluxe travel mini pro classic "
+    "wireless ergonomic vintage organic portable heavy light spare kit "
+    "lamp chair desk mug bottle cable charger stand bag shelf speaker"
+).split()
+
+
+def make_items(count, rng):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": 100_000 + i,
+            "name": " ".join(rng.choices(WORDS, k=3)),
+            "description": (
+                None if rng.random() < 0.3 else " ".join(rng.choices(WORDS, k=12))
+            ),
+            "price": round(rng.uniform(1, 500), 2),
+            "owner": "alice",
+            "created_at": start + timedelta(seconds=rng.randrange(10**7)),
+        }
+        for i in range(count)
+    ]
+
+
+def json_app(body):
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def ndjson_app(chunks):
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")],
+            }
+        )
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+async def measure(app, level, encoding):
+    middleware = CompressionMiddleware(app, minimum_size=1024, level=level)
+    scope = {"type": "http", "headers": [(b"accept-encoding", encoding.encode())]}
+    sent = 0
+
+    async def send(message):
+        nonlocal sent
+        sent += len(message.get("body", b""))
+
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        await middleware(scope, None, send)
+    return (time.process_time() - start) / ROUNDS, sent // ROUNDS
+
+
+def main():
+    rng = random.Random(1)
+    print(
+        f"{'body':>14} {'raw KB':>7} {'enc':>7} {'level':>5} {'out KB':>7}"
+        f" {'saved':>6} {'CPU us':>8} {'us/KB saved':>12}"
+    )
+    for count in PAGE_SIZES:
+        items = make_items(count, rng)
+        lines = [dumps(item) + b"\n" for item in items]
+        chunks = [
+            b"".join(lines[i : i + STREAM_CHUNK_SIZE])
+            for i in range(0, len(lines), STREAM_CHUNK_SIZE)
+        ]
+        for label, app, raw in (
+            (f"json x{count}", json_app(dumps(items)), len(dumps(items))),
+            (f"ndjson x{count}", ndjson_app(chunks), sum(map(len, chunks))),
+        ):
+            for encoding in ("gzip", "deflate"):
+                for level in LEVELS:
+                    cpu, out = asyncio.run(measure(app, level, encoding))
+                    saved = raw - out
+                    per_kb = cpu * 1e6 / (saved / 1024) if saved > 0 else 0.0
+                    print(
+                        f"{label:>14} {raw / 1024:>7.1f} {encoding:>7} {level:>5}"
+                        f" {out / 1024:>7.1f} {saved / raw:>6.0%}"
+                        f" {cpu * 1e6:>8.0f} {per_kb:>12.2f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
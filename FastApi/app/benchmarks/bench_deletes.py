@@ -0,0 +1,90 @@
+"""Deletes with tombstones against deleting from the sorted owner indexes.
+
+Run from FastApi/app:  python benchmarks/bench_deletes.py
+"""
+
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import ItemStore
+
+SIZES = (10_000, 100_000, 300_000)
+DELETE_SHARE = 0.25
+PAGE = 100
+
+
+def seed(store, count, rng):
+    now = datetime.utcnow()
+    return store.create_many(
+        [
+            {
+                "name": f"item-{i}",
+                "description": None,
+                "price": round(rng.uniform(0, 1000), 2),
+                "owner": "bench",
+                "created_at": now,
+            }
+            for i in range(count)
+        ]
+    )
+
+
+def eager_delete_cost(ids, prices, victims):
+    # The list work every delete did before tombstones: two O(n) shifts.
+    start = time.perf_counter()
+    for item_id, price in victims:
+        del ids[bisect_left(ids, item_id)]
+        del prices[bisect_left(prices, (price, item_id))]
+    return time.perf_counter() - start
+
+
+def main():
+    print(
+        f"{'items':>10} {'delete':>10} {'eager index del':>16}"
+        f" {'compact':>10} {'page, dirty':>12} {'page, clean':>12}"
+    )
+    print(f"{'':>10} {'us/op':>10} {'us/op':>16} {'ms':>10} {'us':>12} {'us':>12}")
+    for size in SIZES:
+        rng = random.Random(size)
+        store = ItemStore()
+        items = seed(store, size, rng)
+        victims = rng.sample(items, int(size * DELETE_SHARE))
+
+        ids = [item["id"] for item in items]
+        prices = sorted((item["price"], item["id"]) for item in items)
+        eager = eager_delete_cost(
+            ids, prices, [(item["id"], item["price"]) for item in victims]
+        )
+
+        start = time.perf_counter()
+        for item in victims:
+            store.remove(item["id"])
+        delete = time.perf_counter() - start
+
+        def page_time():
+            start = time.perf_counter()
+            for _ in range(200):
+                store.page_by_owner("bench", None, PAGE)
+                store.page_by_price("bench", None, None, None, PAGE)
+            return (time.perf_counter() - start) / 400 * 1e6
+
+        dirty = page_time()
+        start = time.perf_counter()
+        store.compact()
+        compact = time.perf_counter() - start
+        clean = page_time()
+        print(
+            f"{size:>10} {delete / len(victims) * 1e6:>10.2f}"
+            f" {eager / len(victims) * 1e6:>16.2f} {compact * 1e3:>10.1f}"
+            f" {dirty:>12.1f} {clean:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
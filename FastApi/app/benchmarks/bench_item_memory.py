@@ -0,0 +1,78 @@
+"""Bytes per item for dict items against compact ItemRecords.
+
+Reports the items alone and the whole ItemStore with its indexes, measured
+with tracemalloc.
+
+Run from FastApi/app:  python benchmarks/bench_item_memory.py [count]
+"""
+
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import ItemRecord
+from store import ItemStore
+
+OWNERS = 100
+
+
+def make_items(count, rng):
+    start = datetime(2024, 1, 1)
+    owners = [f"user-{i}" for i in range(OWNERS)]
+    return [
+        {
+            "id": i + 1,
+            "name": f"item {i}",
+            "description": None if i % 2 else f"description of item {i}",
+            "price": round(rng.uniform(0, 1000), 2),
+            "owner": owners[i % OWNERS],
+            # Each request builds its own datetime.
+            "created_at": start + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(count)
+
+    def items_only(compact):
+        # Fresh dicts each time; the strings they hold are counted too.
+        items = make_items(count, rng)
+        return [ItemRecord(item) for item in items] if compact else items
+
+    def store(compact):
+        items = make_items(count, rng)
+        store = ItemStore(compact_items=compact)
+        store.load(items, count)
+        return store
+
+    print(f"{count} items, bytes per item")
+    print(f"{'':>12} {'dict':>8} {'record':>8} {'saved':>8}")
+    for name, build in (("items only", items_only), ("whole store", store)):
+        as_dicts = measure(lambda: build(False)) / count
+        as_records = measure(lambda: build(True)) / count
+        saved = (1 - as_records / as_dicts) * 100
+        print(f"{name:>12} {as_dicts:>8.0f} {as_records:>8.0f} {saved:>7.0f}%")
+
+
+if __name__ == "__main__":
+    main()
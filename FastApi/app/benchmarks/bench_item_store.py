@@ -0,0 +1,70 @@
+"""Request latency for item lookups as items_db grows.
+
+Run from FastApi/app:  python benchmarks/bench_item_store.py
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the app itself: rate limiting would turn most of these
+# requests into 429s.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+from fastapi.testclient import TestClient
+
+import main
+
+SIZES = [1_000, 10_000, 100_000, 300_000]
+REQUESTS = 500
+
+
+def seed(count):
+    main.items_db.clear()
+    now = datetime.utcnow()
+    for i in range(count):
+        main.items_db.create(
+            {
+                "name": f"item-{i}",
+                "description": None,
+                "price": float(i % 1000),
+                "owner": f"user-{i % 1000}",
+                "created_at": now,
+            }
+        )
+
+
+def timed(client, method, url, headers):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.request(method, url, headers=headers)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def main_bench():
+    client = TestClient(main.app)
+    client.post(
+        "/auth/register",
+        json={"username": "bench", "email": "bench@example.com", "password": "pw"},
+    )
+    token = client.post(
+        "/auth/login", json={"username": "bench", "password": "pw"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    print(f"{'items':>10} {'GET /items/{id} us':>20} {'GET /items us':>15}")
+    for size in SIZES:
+        seed(size)
+        for _ in range(10):
+            item_id = client.post(
+                "/items", json={"name": "mine", "price": 1.0}, headers=headers
+            ).json()["id"]
+        one = timed(client, "GET", f"/items/{item_id}", headers)
+        own = timed(client, "GET", "/items", headers)
+        print(f"{size:>10} {one:>20.1f} {own:>15.1f}")
+
+
+if __name__ == "__main__":
+    main_bench()
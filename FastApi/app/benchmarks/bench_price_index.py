@@ -0,0 +1,86 @@
+"""Price range queries through the price index against a scan-and-sort.
+
+Run from FastApi/app:  python benchmarks/bench_price_index.py
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import ItemStore
+
+SIZES = (1_000, 10_000, 100_000, 300_000)
+QUERIES = 500
+LIMIT = 20
+
+
+def seed(store, count, rng):
+    now = datetime.utcnow()
+    store.create_many(
+        [
+            {
+                "name": f"item-{i}",
+                "description": None,
+                "price": round(rng.uniform(0, 1000), 2),
+                "owner": "bench",
+                "created_at": now,
+            }
+            for i in range(count)
+        ]
+    )
+
+
+def scan_and_sort(store, low, high):
+    # What GET /items had to do before the index existed.
+    matches = [
+        item for item in store.page_by_owner("bench") if low <= item["price"] <= high
+    ]
+    matches.sort(key=lambda item: (item["price"], item["id"]))
+    return matches[:LIMIT]
+
+
+def timed(func, ranges):
+    start = time.perf_counter()
+    for low, high in ranges:
+        func(low, high)
+    return (time.perf_counter() - start) / len(ranges) * 1e6
+
+
+def main():
+    print(
+        f"{'items':>10} {'range, indexed':>16} {'cheapest N':>12}"
+        f" {'scan+sort':>12}   (us/query, limit {LIMIT})"
+    )
+    for size in SIZES:
+        rng = random.Random(size)
+        store = ItemStore()
+        seed(store, size, rng)
+        ranges = []
+        for _ in range(QUERIES):
+            low = rng.uniform(0, 900)
+            ranges.append((low, low + 100))
+
+        indexed = timed(
+            lambda low, high: store.page_by_price("bench", low, high, limit=LIMIT),
+            ranges,
+        )
+        cheapest = timed(
+            lambda low, high: store.page_by_price("bench", limit=LIMIT), ranges
+        )
+        # The scan is slow enough that a few queries are plenty.
+        scanned = timed(lambda low, high: scan_and_sort(store, low, high), ranges[:5])
+        print(f"{size:>10} {indexed:>16.1f} {cheapest:>12.1f} {scanned:>12.1f}")
+
+        # Sanity check: both ways return the same items.
+        low, high = ranges[0]
+        assert store.page_by_price("bench", low, high, limit=LIMIT) == scan_and_sort(
+            store, low, high
+        )
+
+
+if __name__ == "__main__":
+    main()
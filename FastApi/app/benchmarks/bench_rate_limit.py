@@ -0,0 +1,72 @@
+"""Per-request cost of the token-bucket rate limiter.
+
+Run from FastApi/app:  python benchmarks/bench_rate_limit.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import RateLimit, RateLimitMiddleware, TokenBucketLimiter
+
+CALLS = 1_000_000
+KEYS = 10_000
+LIMIT = RateLimit(rate=1e9, burst=10**9)
+
+
+def bench_allow():
+    limiter = TokenBucketLimiter(max_buckets=KEYS)
+    keys = [f"user:{i}" for i in range(KEYS)]
+    start = time.perf_counter()
+    for i in range(CALLS):
+        limiter.allow("*", keys[i % KEYS], LIMIT)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def bench_allow_with_eviction():
+    # Twice as many clients as buckets, so every call evicts one.
+    limiter = TokenBucketLimiter(max_buckets=KEYS)
+    keys = [f"user:{i}" for i in range(KEYS * 2)]
+    start = time.perf_counter()
+    for i in range(CALLS):
+        limiter.allow("*", keys[i % (KEYS * 2)], LIMIT)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+async def noop_app(scope, receive, send):
+    pass
+
+
+async def bench_middleware():
+    middleware = RateLimitMiddleware(
+        noop_app,
+        limiter=TokenBucketLimiter(max_buckets=KEYS),
+        rules={},
+        default=LIMIT,
+        key_func=lambda scope: None,
+    )
+    scopes = [
+        {
+            "type": "http",
+            "path": "/items",
+            "headers": [],
+            "client": (f"10.0.{i // 256}.{i % 256}", 1),
+        }
+        for i in range(KEYS)
+    ]
+    calls = CALLS // 4
+    start = time.perf_counter()
+    for i in range(calls):
+        await middleware(scopes[i % KEYS], None, None)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+if __name__ == "__main__":
+    print(f"limiter.allow                 {bench_allow():6.2f} us/call")
+    print(f"limiter.allow (evicting)      {bench_allow_with_eviction():6.2f} us/call")
+    print(
+        f"middleware (incl. noop app)   {asyncio.run(bench_middleware()):6.2f} us/call"
+    )
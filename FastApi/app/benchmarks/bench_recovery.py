@@ -0,0 +1,109 @@
+"""Crash recovery time of the journaled in-memory store.
+
+Journals N item writes (creates, updates and deletes over a bounded set of
+live items), "crashes" without a final snapshot, then times recovery from
+the journal alone and from a snapshot plus the journal tail.
+
+Run from FastApi/app:  python benchmarks/bench_recovery.py [N]   (default 10M)
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import DurableStorage, recover
+from store import ItemStore, UserStore
+
+OPERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+OWNERS = 1_000
+LIVE_ITEMS = 200_000
+# The snapshot run replays only the last TAIL_FRACTION of the journal.
+TAIL_FRACTION = 0.1
+
+
+def write_journal(directory, operations, snapshot_at=None):
+    users, items = UserStore(), ItemStore()
+    # fsync is not what is measured here, so skip it to write the journal
+    # quickly; recovery reads the same bytes either way.
+    storage = DurableStorage(
+        directory, users, items, sync=False, snapshot_every=operations + 1
+    )
+    storage.open()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    live = []
+    start = time.perf_counter()
+    for n in range(operations):
+        if n == snapshot_at:
+            storage.snapshot()
+        roll = rng.random()
+        if len(live) < LIVE_ITEMS and (roll < 0.5 or not live):
+            item = items.create(
+                {
+                    "name": f"item {n % 5000}",
+                    "description": "journaled",
+                    "price": float(n % 1000),
+                    "owner": f"user-{n % OWNERS}",
+                    "created_at": now,
+                }
+            )
+            live.append(item["id"])
+        elif roll < 0.8:
+            item = dict(items.get(live[rng.randrange(len(live))]))
+            item["price"] = rng.random() * 1000
+            items.replace(item)
+        else:
+            index = rng.randrange(len(live))
+            live[index], live[-1] = live[-1], live[index]
+            items.remove(live.pop())
+    elapsed = time.perf_counter() - start
+    # Simulate a crash: flush what was written, but take no final snapshot.
+    storage.journal.close()
+    storage._stop.set()
+    return len(items), elapsed
+
+
+def directory_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+    )
+
+
+def time_recovery(directory):
+    users, items = UserStore(), ItemStore()
+    stats = recover(directory, users, items)
+    return stats, len(items)
+
+
+def report(label, directory, stats, items):
+    print(
+        f"{label:24} {stats.seconds:8.2f} s  snapshot items {stats.snapshot_items:>8}"
+        f"  journal records replayed {stats.replayed:>10}"
+        f"  on disk {directory_size(directory) / 1e6:,.0f} MB  items {items}"
+    )
+
+
+def main():
+    print(f"{OPERATIONS:,} journaled operations, up to {LIVE_ITEMS:,} live items")
+    with tempfile.TemporaryDirectory() as tmp:
+        live, elapsed = write_journal(tmp, OPERATIONS)
+        print(f"wrote journal in {elapsed:.1f} s ({OPERATIONS / elapsed:,.0f} ops/s)")
+        stats, items = time_recovery(tmp)
+        assert items == live
+        report("journal only", tmp, stats, items)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_at = int(OPERATIONS * (1 - TAIL_FRACTION))
+        live, _ = write_journal(tmp, OPERATIONS, snapshot_at=snapshot_at)
+        stats, items = time_recovery(tmp)
+        assert items == live
+        report("snapshot + journal tail", tmp, stats, items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""CPU spent renewing access tokens: logging in again against POST /auth/refresh.
+
+Clients renew when their access token expires, every
+ACCESS_TOKEN_EXPIRE_MINUTES. This times the work each renewal costs the
+server, on a refresh token store already holding every client's session,
+and scales it to a day of renewals.
+
+Run from FastApi/app:  python benchmarks/bench_refresh.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashing import hash_password, verify_password
+from main import ACCESS_TOKEN_EXPIRE_MINUTES, User, create_access_token
+from refresh_tokens import RefreshTokenStore
+from store import UserStore
+from user_directory import UserDirectory
+
+CLIENTS = 10_000
+LOGINS = 20
+REFRESHES = 20_000
+
+
+def cpu_per_call(fn, count):
+    start = time.process_time()
+    for i in range(count):
+        fn(i)
+    return (time.process_time() - start) / count
+
+
+def main():
+    users = UserStore()
+    hashed = hash_password("correct horse")
+    for i in range(CLIENTS):
+        users.add(
+            {
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "full_name": None,
+                "hashed_password": hashed,
+                "disabled": False,
+            }
+        )
+    directory = UserDirectory(users, lambda data: User(**data), CLIENTS)
+    store = RefreshTokenStore(maxsize=4 * CLIENTS)
+    tokens = [store.issue(f"user{i}") for i in range(CLIENTS)]
+
+    def login(i):
+        user_data = users.get(f"user{i % CLIENTS}")
+        verify_password("correct horse", user_data["hashed_password"])
+        create_access_token({"sub": user_data["username"]})
+
+    def refresh(i):
+        username, tokens[i % CLIENTS] = store.rotate(tokens[i % CLIENTS])
+        user = directory.get(username)
+        create_access_token({"sub": user.username})
+
+    login_cpu = cpu_per_call(login, LOGINS)
+    refresh_cpu = cpu_per_call(refresh, REFRESHES)
+
+    renewals = CLIENTS * 24 * 60 // ACCESS_TOKEN_EXPIRE_MINUTES
+    print(f"bcrypt cost {hashed.split('$')[2]}, {CLIENTS} clients")
+    print(f"{'':>8} {'CPU ms/renewal':>15} {'CPU s/day':>10} {'cores':>6}")
+    for name, cost in (("login", login_cpu), ("refresh", refresh_cpu)):
+        per_day = cost * renewals
+        print(f"{name:>8} {cost * 1e3:>15.3f} {per_day:>10.1f} {per_day / 86400:>6.3f}")
+    print(
+        f"{renewals} renewals a day; refresh uses {login_cpu / refresh_cpu:.0f}x"
+        " less CPU per renewal"
+    )
+
+
+if __name__ == "__main__":
+    main()
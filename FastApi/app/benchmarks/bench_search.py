@@ -0,0 +1,82 @@
+"""Search latency against how many items one owner has.
+
+Run from FastApi/app:  python benchmarks/bench_search.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_store import SQLiteDatabase, SQLiteItemRepository
+from store import ItemStore
+
+SIZES = (1_000, 10_000, 100_000)
+QUERIES = 200
+WORDS = [f"word{i}" for i in range(5_000)]
+# A few words common enough to appear in a large share of items.
+COMMON = ["laptop", "phone", "cable", "desk"]
+
+
+def make_items(count, rng):
+    for _ in range(count):
+        name = " ".join(rng.choices(WORDS, k=2) + rng.choices(COMMON, k=1))
+        description = " ".join(rng.choices(WORDS, k=8))
+        yield {
+            "name": name,
+            "description": description,
+            "price": 1.0,
+            "owner": "bench",
+            "created_at": datetime.utcnow(),
+        }
+
+
+def time_queries(repo, queries, prefix=False):
+    start = time.perf_counter()
+    for query in queries:
+        repo.search("bench", query, prefix=prefix)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def bench(repo, size, rng):
+    repo.create_many(list(make_items(size, rng)))
+    rare = [rng.choice(WORDS) for _ in range(QUERIES)]
+    common = [rng.choice(COMMON) for _ in range(QUERIES)]
+    both = [f"{rng.choice(COMMON)} {rng.choice(WORDS)}" for _ in range(QUERIES)]
+    prefixes = [rng.choice(WORDS)[:6] for _ in range(QUERIES)]
+    return (
+        time_queries(repo, rare),
+        time_queries(repo, common),
+        time_queries(repo, both),
+        time_queries(repo, prefixes, prefix=True),
+    )
+
+
+def main():
+    print(
+        f"{'backend':8} {'items':>8} {'rare':>10} {'common':>10}"
+        f" {'common+rare':>12} {'prefix':>10}   (us/query)"
+    )
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = [
+                ("memory", ItemStore()),
+                (
+                    "sqlite",
+                    SQLiteItemRepository(SQLiteDatabase(os.path.join(tmp, "b.db"))),
+                ),
+            ]
+            for name, repo in backends:
+                rare, common, both, prefix = bench(repo, size, random.Random(size))
+                print(
+                    f"{name:8} {size:>8} {rare:>10.1f} {common:>10.1f}"
+                    f" {both:>12.1f} {prefix:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Response serialization: response_model validation vs. TrustedJSONResponse.
+
+Run from FastApi/app:  python benchmarks/bench_serialization.py
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the app itself: rate limiting would turn most of these
+# requests into 429s.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+import main
+from serialization import dumps
+
+PAGE = 1000
+ROUNDS = 200
+REQUESTS = 1000
+
+
+def response_model_path(items, adapter):
+    # What FastAPI does for a returned dict/list with response_model set.
+    validated = adapter.validate_python(items)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def per_second(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return count / (time.perf_counter() - start)
+
+
+def encode_bench():
+    now = datetime.utcnow()
+    items = [
+        {
+            "id": i,
+            "name": f"item-{i}",
+            "description": "a reasonably long item description",
+            "price": i * 1.5,
+            "owner": "bench",
+            "created_at": now,
+        }
+        for i in range(PAGE)
+    ]
+    list_adapter = TypeAdapter(List[main.Item])
+    one_adapter = TypeAdapter(main.Item)
+    print(f"encoding a {PAGE}-item page / a single item (ops/s):")
+    print(
+        f"  response_model  list={per_second(lambda: response_model_path(items, list_adapter), ROUNDS):9.0f}"
+        f"  item={per_second(lambda: response_model_path(items[0], one_adapter), ROUNDS * 100):9.0f}"
+    )
+    print(
+        f"  trusted dumps   list={per_second(lambda: dumps(items), ROUNDS):9.0f}"
+        f"  item={per_second(lambda: dumps(items[0]), ROUNDS * 100):9.0f}"
+    )
+
+
+def request_bench():
+    client = TestClient(main.app)
+    client.post(
+        "/auth/register",
+        json={"username": "bench", "email": "bench@example.com", "password": "pw"},
+    )
+    token = client.post(
+        "/auth/login", json={"username": "bench", "password": "pw"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post(
+        "/items/bulk",
+        json=[{"name": f"item-{i}", "price": i * 1.5} for i in range(PAGE)],
+        headers=headers,
+    )
+    item_id = client.get("/items?limit=1", headers=headers).json()[0]["id"]
+    print("end-to-end requests/s:")
+    print(
+        f"  GET /items?limit={PAGE}  "
+        f"{per_second(lambda: client.get(f'/items?limit={PAGE}', headers=headers), REQUESTS // 10):8.0f}"
+    )
+    print(
+        f"  GET /items/{{id}}        "
+        f"{per_second(lambda: client.get(f'/items/{item_id}', headers=headers), REQUESTS):8.0f}"
+    )
+
+
+if __name__ == "__main__":
+    encode_bench()
+    request_bench()
+    main.hashing_pool.shutdown()
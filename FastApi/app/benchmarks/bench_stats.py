@@ -0,0 +1,76 @@
+"""GET /items/stats aggregates against computing them from a full listing.
+
+Run from FastApi/app:  python benchmarks/bench_stats.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_store import SQLiteDatabase, SQLiteItemRepository
+from store import ItemStore
+
+SIZES = (1_000, 10_000, 100_000)
+QUERIES = 200
+
+
+def seed(store, count, rng):
+    now = datetime.utcnow()
+    items = store.create_many(
+        [
+            {
+                "name": f"item-{i}",
+                "description": None,
+                "price": round(rng.uniform(0, 1000), 2),
+                "owner": "bench",
+                "created_at": now,
+            }
+            for i in range(count)
+        ]
+    )
+    # Delete the cheapest and dearest tenth so min and max have moved.
+    items.sort(key=lambda item: item["price"])
+    tenth = count // 10
+    store.remove_many([item["id"] for item in items[:tenth] + items[-tenth:]])
+
+
+def from_listing(store):
+    # What clients did before: fetch everything and aggregate it.
+    prices = [item["price"] for item in store.page_by_owner("bench")]
+    return len(prices), sum(prices), min(prices), max(prices)
+
+
+def timed(func, store):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        func(store)
+    return (time.perf_counter() - start) / QUERIES * 1e6
+
+
+def main():
+    print(f"{'backend':>8} {'items':>8} {'stats':>10} {'from listing':>14}   (us/call)")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            rng = random.Random(size)
+            db = SQLiteDatabase(os.path.join(directory, f"{size}.db"))
+            for name, store in (
+                ("memory", ItemStore()),
+                ("sqlite", SQLiteItemRepository(db)),
+            ):
+                seed(store, size, rng)
+                # The memory store's first call steps over the deleted
+                # keys once; time the calls after it.
+                store.stats("bench")
+                stats = timed(lambda store: store.stats("bench"), store)
+                listing = timed(from_listing, store)
+                print(f"{name:>8} {size:>8} {stats:>10.1f} {listing:>14.1f}")
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare the in-memory and SQLite item repositories.
+
+Run from FastApi/app:  python benchmarks/bench_storage_backends.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_store import SQLiteDatabase, SQLiteItemRepository
+from store import ItemStore
+
+ITEMS = 50_000
+OWNERS = 500
+LOOKUPS = 20_000
+PAGES = 2_000
+
+
+def timed(fn, count):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench(name, repo):
+    now = datetime.utcnow()
+
+    def create():
+        for i in range(ITEMS):
+            repo.create(
+                {
+                    "name": f"item-{i}",
+                    "description": "benchmark item",
+                    "price": float(i % 1000),
+                    "owner": f"user-{i % OWNERS}",
+                    "created_at": now,
+                }
+            )
+
+    ids = list(range(1, ITEMS + 1))
+    random.shuffle(ids)
+
+    def get():
+        for item_id in ids[:LOOKUPS]:
+            repo.get(item_id)
+
+    def page():
+        for i in range(PAGES):
+            repo.page_by_owner(f"user-{i % OWNERS}", limit=50)
+
+    print(
+        f"{name:<8} create={timed(create, ITEMS):7.1f}us "
+        f"get={timed(get, LOOKUPS):7.1f}us "
+        f"page(50)={timed(page, PAGES):7.1f}us"
+    )
+
+
+if __name__ == "__main__":
+    bench("memory", ItemStore())
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SQLiteDatabase(os.path.join(tmp, "bench.db"))
+        bench("sqlite", SQLiteItemRepository(db))
+        db.close()
@@ -0,0 +1,98 @@
+"""Resolving a token's user: building a User per request against the user
+directory, and finding a user by email with a scan against the index.
+
+Run from FastApi/app:  python benchmarks/bench_user_directory.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import User
+from repository import normalize_email
+from sqlite_store import SQLiteDatabase, SQLiteUserRepository
+from store import UserStore
+from user_directory import UserDirectory
+
+USERS = (1_000, 10_000, 100_000)
+LOOKUPS = 20_000
+SCANS = 20
+
+
+def seed(users, count):
+    for i in range(count):
+        users.add(
+            {
+                "username": f"user{i}",
+                "email": f"User{i}@Example.com",
+                "full_name": f"User {i}",
+                "hashed_password": "$2b$12$" + "x" * 53,
+                "disabled": False,
+            }
+        )
+
+
+def per_call(fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def build_each_time(users):
+    # What get_current_user did on every token cache miss.
+    def resolve(username):
+        return User(**users.get(username))
+
+    return resolve
+
+
+def scan_for_email(users):
+    # Without the index, the only way to find a user by email.
+    def find(email):
+        email = normalize_email(email)
+        for user_data in users:
+            if normalize_email(user_data["email"]) == email:
+                return user_data
+        return None
+
+    return find
+
+
+def main():
+    print(
+        f"{'backend':>8} {'users':>8} {'build User':>11} {'directory':>10}   (us/call)"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for count in USERS:
+            db = SQLiteDatabase(os.path.join(directory, f"{count}.db"))
+            for name, users in (
+                ("memory", UserStore()),
+                ("sqlite", SQLiteUserRepository(db)),
+            ):
+                seed(users, count)
+                names = [f"user{i * 7919 % count}" for i in range(LOOKUPS)]
+                views = UserDirectory(users, lambda data: User(**data), count)
+                for username in names:
+                    views.get(username)
+                built = per_call(build_each_time(users), names)
+                cached = per_call(views.cached, names)
+                print(f"{name:>8} {count:>8} {built:>11.2f} {cached:>10.2f}")
+            db.close()
+
+    print()
+    print(f"{'users':>8} {'scan':>12} {'email index':>12}   (us/lookup, memory)")
+    for count in USERS:
+        users = UserStore()
+        seed(users, count)
+        emails = [f"USER{count - 1 - i}@example.COM" for i in range(SCANS)]
+        scanned = per_call(scan_for_email(users), emails)
+        indexed = per_call(users.get_by_email, emails * (LOOKUPS // SCANS))
+        print(f"{count:>8} {scanned:>12.1f} {indexed:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
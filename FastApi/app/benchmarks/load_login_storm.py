@@ -0,0 +1,98 @@
+"""CRUD latency while a burst of logins is hashing passwords.
+
+Run from FastApi/app:  python benchmarks/load_login_storm.py
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the app itself: rate limiting would turn most of these
+# requests into 429s.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import httpx
+
+import main
+
+CRUD_REQUESTS = 500
+CRUD_CONCURRENCY = 20
+STORM_CONCURRENCY = 50
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def crud_load(client, headers, item_id):
+    latencies = []
+    queue = iter(range(CRUD_REQUESTS))
+
+    async def worker():
+        for _ in queue:
+            start = time.perf_counter()
+            await client.get(f"/items/{item_id}", headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(CRUD_CONCURRENCY)))
+    return latencies
+
+
+async def login_storm(client, stop, counts):
+    async def worker():
+        while not stop.is_set():
+            response = await client.post(
+                "/auth/login", json={"username": "bench", "password": "pw"}
+            )
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(STORM_CONCURRENCY)))
+
+
+def report(label, latencies):
+    print(
+        f"{label:<18} p50={statistics.median(latencies):7.2f}ms "
+        f"p99={percentile(latencies, 99):7.2f}ms"
+    )
+
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.post(
+            "/auth/register",
+            json={"username": "bench", "email": "bench@example.com", "password": "pw"},
+        )
+        token = (
+            await client.post(
+                "/auth/login", json={"username": "bench", "password": "pw"}
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        item_id = (
+            await client.post(
+                "/items", json={"name": "x", "price": 1.0}, headers=headers
+            )
+        ).json()["id"]
+
+        report("idle", await crud_load(client, headers, item_id))
+
+        stop = asyncio.Event()
+        counts = {}
+        storm = asyncio.create_task(login_storm(client, stop, counts))
+        await asyncio.sleep(0.5)
+        report("login storm", await crud_load(client, headers, item_id))
+        stop.set()
+        await storm
+        print(f"login responses by status: {counts}")
+    main.hashing_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,302 @@
+"""Load-testing harness for the auth + items API.
+
+Registers and logs in a set of users, then runs a weighted mix of item
+operations from many concurrent clients and reports throughput and
+latency percentiles per endpoint as JSON.
+
+Run from FastApi/app.
+
+In-process (no server needed, rate limiting is switched off):
+    python benchmarks/loadtest.py run --users 50 --requests 20000 -o new.json
+
+Against a running server (start it with RATE_LIMIT_ENABLED=0):
+    python benchmarks/loadtest.py run --base-url http://127.0.0.1:8000 ...
+
+Compare two runs, exiting non-zero if any endpoint regressed:
+    python benchmarks/loadtest.py compare old.json new.json --threshold 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+import httpx
+
+DEFAULT_MIX = "create=20,list=30,get=30,update=10,delete=10"
+# Operations on one existing item.
+ITEM_OPERATIONS = ("get", "update", "delete")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("create", "list", "get", "update", "delete"):
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(len(sorted_samples) * pct / 100))
+    return sorted_samples[index]
+
+
+def make_client(base_url):
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, timeout=30)
+    # Import lazily so the env var is set before the app reads it.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+
+
+class LoadTest:
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.mix = args.mix
+        self.rng = random.Random(args.seed)
+        self.latencies = {name: [] for name in self.mix}
+        self.errors = {name: 0 for name in self.mix}
+        self.users = []  # (headers, list of owned item ids)
+        self.remaining = args.requests
+
+    async def setup_users(self):
+        run_id = uuid.uuid4().hex[:8]
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def setup(i):
+            username = f"lt-{run_id}-{i}"
+            password = "loadtest-password"
+            async with semaphore:
+                await self.client.post(
+                    "/auth/register",
+                    json={
+                        "username": username,
+                        "email": f"{username}@example.com",
+                        "password": password,
+                    },
+                )
+                response = await self.client.post(
+                    "/auth/login", json={"username": username, "password": password}
+                )
+            response.raise_for_status()
+            token = response.json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            owned = []
+            if "create" not in self.mix and any(
+                name in self.mix for name in ITEM_OPERATIONS
+            ):
+                # Nothing in the mix creates items, so give each user one.
+                async with semaphore:
+                    response = await self.client.post(
+                        "/items",
+                        json={
+                            "name": "load",
+                            "description": "load test",
+                            "price": 9.99,
+                        },
+                        headers=headers,
+                    )
+                response.raise_for_status()
+                owned.append(response.json()["id"])
+            return headers, owned
+
+        self.users = await asyncio.gather(*(setup(i) for i in range(self.args.users)))
+
+    def pick_operation(self, owned):
+        """Pick an operation from the mix, or None if none of them can run."""
+        names = list(self.mix)
+        if not owned:
+            # Operations on one item need an item, so only the others can run.
+            names = [name for name in names if name not in ITEM_OPERATIONS]
+            if not names:
+                return None
+        return self.rng.choices(names, weights=[self.mix[n] for n in names])[0]
+
+    async def request(self, name, headers, owned):
+        client = self.client
+        if name == "create":
+            response = await client.post(
+                "/items",
+                json={"name": "load", "description": "load test", "price": 9.99},
+                headers=headers,
+            )
+            if response.status_code == 201:
+                owned.append(response.json()["id"])
+        elif name == "list":
+            response = await client.get(
+                "/items", params={"limit": self.args.page_size}, headers=headers
+            )
+        elif name == "get":
+            response = await client.get(
+                f"/items/{self.rng.choice(owned)}", headers=headers
+            )
+        elif name == "update":
+            response = await client.put(
+                f"/items/{self.rng.choice(owned)}",
+                json={"name": "updated", "price": 19.99},
+                headers=headers,
+            )
+        else:
+            item_id = owned.pop(self.rng.randrange(len(owned)))
+            response = await client.delete(f"/items/{item_id}", headers=headers)
+        return response.status_code < 400
+
+    async def worker(self, deadline):
+        while self.remaining > 0 and time.perf_counter() < deadline:
+            self.remaining -= 1
+            headers, owned = self.rng.choice(self.users)
+            name = self.pick_operation(owned)
+            if name is None:
+                continue
+            start = time.perf_counter()
+            try:
+                ok = await self.request(name, headers, owned)
+            except httpx.HTTPError:
+                ok = False
+            self.latencies[name].append((time.perf_counter() - start) * 1000)
+            if not ok:
+                self.errors[name] += 1
+
+    async def run(self):
+        await self.setup_users()
+        start = time.perf_counter()
+        deadline = start + self.args.duration if self.args.duration else float("inf")
+        await asyncio.gather(
+            *(self.worker(deadline) for _ in range(self.args.concurrency))
+        )
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed):
+        endpoints = {}
+        for name, samples in self.latencies.items():
+            if not samples:
+                continue
+            samples.sort()
+            endpoints[name] = {
+                "count": len(samples),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(samples) / elapsed, 1),
+                "mean_ms": round(sum(samples) / len(samples), 3),
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "config": {
+                "target": self.args.base_url or "in-process",
+                "users": self.args.users,
+                "concurrency": self.args.concurrency,
+                "mix": self.mix,
+                "page_size": self.args.page_size,
+            },
+            "duration_s": round(elapsed, 3),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 1),
+            "endpoints": endpoints,
+        }
+
+
+async def run_command(args):
+    async with make_client(args.base_url) as client:
+        result = await LoadTest(client, args).run()
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def error_rate(endpoint):
+    return endpoint["errors"] / endpoint["count"]
+
+
+def compare(old, new, threshold):
+    """Return a list of regressions: latency or throughput worse by more
+    than ``threshold`` percent, a higher error rate, or an endpoint of the
+    old run that the new run never called."""
+    regressions = []
+    for name, before in old["endpoints"].items():
+        after = new["endpoints"].get(name)
+        if after is None:
+            regressions.append(f"{name}: missing from the new run")
+            continue
+        if error_rate(after) > error_rate(before):
+            regressions.append(
+                f"{name} error_rate: {error_rate(before):.2%} -> "
+                f"{error_rate(after):.2%}"
+            )
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if before[key] and after[key] > before[key] * (1 + threshold / 100):
+                change = (after[key] / before[key] - 1) * 100
+                regressions.append(
+                    f"{name} {key}: {before[key]} -> {after[key]} (+{change:.1f}%)"
+                )
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - threshold / 100):
+            change = (1 - after["throughput_rps"] / before["throughput_rps"]) * 100
+            regressions.append(
+                f"{name} throughput_rps: {before['throughput_rps']} -> "
+                f"{after['throughput_rps']} (-{change:.1f}%)"
+            )
+    return regressions
+
+
+def compare_command(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions above {args.threshold}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a load test")
+    run.add_argument("--base-url", help="server to target; in-process if omitted")
+    run.add_argument("--users", type=int, default=20)
+    run.add_argument("--concurrency", type=int, default=50)
+    run.add_argument("--requests", type=int, default=10_000)
+    run.add_argument(
+        "--duration", type=float, default=0, help="stop after N seconds (0: no limit)"
+    )
+    run.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    run.add_argument("--page-size", type=int, default=100)
+    run.add_argument("--seed", type=int, default=None)
+    run.add_argument("-o", "--output", help="also write the JSON report here")
+
+    diff = commands.add_parser("compare", help="compare two JSON reports")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument(
+        "--threshold", type=float, default=10, help="allowed change in percent"
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        asyncio.run(run_command(args))
+    else:
+        compare_command(args)
+
+
+if __name__ == "__main__":
+    main()
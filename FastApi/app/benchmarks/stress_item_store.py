@@ -0,0 +1,99 @@
+"""Concurrent creates and deletes against ItemStore from many threads.
+
+Checks that every allocated id is unique, that no item is lost or left
+behind, and that the owner index matches the primary index afterwards.
+Exits non-zero on any inconsistency.
+
+Run from FastApi/app:  python benchmarks/stress_item_store.py
+"""
+
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import ItemStore
+
+THREADS = 32
+OPS_PER_THREAD = 5_000
+OWNERS = 8
+
+
+def worker(store, seed):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    def new_item(owner):
+        return {
+            "name": "x",
+            "description": None,
+            "price": 1.0,
+            "owner": owner,
+            "created_at": now,
+        }
+
+    created, deleted = [], []
+    for _ in range(OPS_PER_THREAD):
+        owner = f"user-{rng.randrange(OWNERS)}"
+        roll = rng.random()
+        if roll < 0.5:
+            item = store.create(new_item(owner))
+            created.append(item["id"])
+        elif roll < 0.6:
+            batch = store.create_many(
+                [new_item(owner) for _ in range(rng.randrange(1, 20))]
+            )
+            created.extend(item["id"] for item in batch)
+        elif created:
+            # Delete one of this thread's own items, so each id is deleted once.
+            item_id = created.pop(rng.randrange(len(created)))
+            store.remove(item_id)
+            deleted.append(item_id)
+    return created, deleted
+
+
+def check(store, results):
+    kept = [item_id for created, _ in results for item_id in created]
+    deleted = [item_id for _, removed in results for item_id in removed]
+    all_ids = kept + deleted
+    errors = []
+    if len(all_ids) != len(set(all_ids)):
+        errors.append(f"{len(all_ids) - len(set(all_ids))} duplicate ids allocated")
+    if set(kept) != {item["id"] for item in store}:
+        errors.append("stored ids differ from the ids that should remain")
+    indexed = [
+        item["id"]
+        for owner in range(OWNERS)
+        for item in store.page_by_owner(f"user-{owner}")
+    ]
+    if sorted(indexed) != sorted(kept):
+        errors.append("owner index does not match the primary index")
+    return len(all_ids), len(deleted), errors
+
+
+def main():
+    # Switch threads often to make interleavings more likely.
+    sys.setswitchinterval(1e-6)
+    store = ItemStore()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(lambda seed: worker(store, seed), range(THREADS)))
+    elapsed = time.perf_counter() - start
+    created, deleted, errors = check(store, results)
+    print(
+        f"{THREADS} threads: {created} creates, {deleted} deletes "
+        f"in {elapsed:.2f}s, {len(store)} items left"
+    )
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+    print("OK: ids unique, nothing lost")
+
+
+if __name__ == "__main__":
+    main()
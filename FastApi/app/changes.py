@@ -0,0 +1,188 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from serialization import dumps
+
+
+class OwnerLog:
+    """The most recent changes to one owner's items, as SSE frames."""
+
+    __slots__ = ("events", "floor", "waiters", "subscribers")
+
+    def __init__(self, capacity: int, floor: int):
+        self.events: Deque[Tuple[int, bytes]] = deque(maxlen=capacity)
+        # Changes numbered up to and including this may be missing.
+        self.floor = floor
+        # One future per event loop with subscribers waiting for a change.
+        self.waiters: List[asyncio.Future] = []
+        self.subscribers = 0
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ChangeFeed:
+    """Item changes per owner, streamed as Server-Sent Events.
+
+    Each owner has a ring buffer of their last ``capacity`` changes, already
+    encoded as SSE frames. A subscriber only keeps a cursor into it, so a
+    write is encoded once and costs the same for one subscriber or ten
+    thousand: it appends to the buffer and wakes one shared future per
+    event loop. Writers never wait on subscribers.
+
+    A slow subscriber just reads further behind. Once the changes after
+    its cursor have been overwritten it gets a ``reset`` event and the
+    stream ends, so memory stays bounded whatever the consumers do. The
+    same happens when resuming from a position that is no longer buffered.
+
+    Event ids come from one increasing sequence seeded with the current
+    time in nanoseconds, so an id from before a restart is recognised as
+    too old rather than mistaken for a newer change. Buffers are kept for
+    at most ``max_owners`` owners, least recently used first out, but never
+    for an owner with subscribers.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 256,
+        max_owners: int = 10_000,
+        heartbeat: float = 15.0,
+        stripes: int = 64,
+    ):
+        self.capacity = capacity
+        self.max_owners = max_owners
+        self.heartbeat = heartbeat
+        self._seq = itertools.count(time.time_ns())
+        self.last_seq = next(self._seq)
+        self._owners: "OrderedDict[str, OwnerLog]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ordering = [threading.Lock() for _ in range(stripes)]
+        self.subscribers = 0
+        self.published = 0
+        self.resets = 0
+
+    @contextmanager
+    def ordered(self, owner: str) -> Iterator[None]:
+        """Hold around a write and its ``publish`` so that concurrent writes
+        for one owner are published in the order they were applied."""
+        with self._ordering[hash(owner) % len(self._ordering)]:
+            yield
+
+    def publish(self, owner: str, kind: str, payloads: Iterable[dict]) -> None:
+        encoded = [dumps(payload) for payload in payloads]
+        if not encoded:
+            return
+        kind_bytes = kind.encode()
+        with self._lock:
+            log = self._log_for(owner)
+            for data in encoded:
+                seq = self.last_seq = next(self._seq)
+                if len(log.events) == self.capacity:
+                    log.floor = log.events[0][0]
+                log.events.append(
+                    (seq, b"id: %d\nevent: %b\ndata: %b\n\n" % (seq, kind_bytes, data))
+                )
+            self.published += len(encoded)
+            waiters, log.waiters = log.waiters, []
+        for waiter in waiters:
+            try:
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                # That event loop has been closed.
+                pass
+
+    async def subscribe(
+        self, owner: str, after: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield SSE frames for the owner's changes after event id ``after``,
+        or from now on if it is None."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            log = self._log_for(owner)
+            log.subscribers += 1
+            self.subscribers += 1
+            cursor = self.last_seq if after is None else after
+        try:
+            # Sent right away so clients and proxies see the stream open.
+            yield b"retry: 1000\n\n"
+            while True:
+                frames = waiter = reset = None
+                with self._lock:
+                    if cursor < log.floor or cursor > self.last_seq:
+                        self.resets += 1
+                        reset = self.last_seq
+                    else:
+                        frames = self._frames_after(log, cursor)
+                        if frames:
+                            cursor = log.events[-1][0]
+                        else:
+                            waiter = self._waiter(log, loop)
+                if reset is not None:
+                    # Resync with GET /items, then resume after this id.
+                    yield b"id: %d\nevent: reset\ndata: {}\n\n" % reset
+                    return
+                if frames:
+                    yield b"".join(frames)
+                    continue
+                done, _ = await asyncio.wait([waiter], timeout=self.heartbeat)
+                if not done:
+                    # Keeps idle connections open through proxies.
+                    yield b": keepalive\n\n"
+        finally:
+            with self._lock:
+                log.subscribers -= 1
+                self.subscribers -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": self.subscribers,
+                "owners": len(self._owners),
+                "published": self.published,
+                "resets": self.resets,
+                "last_event_id": self.last_seq,
+            }
+
+    def _log_for(self, owner: str) -> OwnerLog:
+        # Called with the lock held.
+        log = self._owners.get(owner)
+        if log is not None:
+            self._owners.move_to_end(owner)
+            return log
+        log = self._owners[owner] = OwnerLog(self.capacity, self.last_seq)
+        for _ in range(len(self._owners) - self.max_owners):
+            oldest, oldest_log = next(iter(self._owners.items()))
+            if oldest_log.subscribers or oldest_log is log:
+                self._owners.move_to_end(oldest)
+            else:
+                del self._owners[oldest]
+        return log
+
+    @staticmethod
+    def _frames_after(log: OwnerLog, cursor: int) -> List[bytes]:
+        # Called with the lock held. Walks back from the newest change, so
+        # this costs the number of new changes, not the buffer size.
+        frames = []
+        for seq, frame in reversed(log.events):
+            if seq <= cursor:
+                break
+            frames.append(frame)
+        frames.reverse()
+        return frames
+
+    @staticmethod
+    def _waiter(log: OwnerLog, loop: asyncio.AbstractEventLoop) -> asyncio.Future:
+        # Called with the lock held.
+        for waiter in log.waiters:
+            if waiter.get_loop() is loop:
+                return waiter
+        waiter = loop.create_future()
+        log.waiters.append(waiter)
+        return waiter
@@ -0,0 +1,198 @@
+import zlib
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+# zlib window bits for each encoding: gzip adds its header and trailer,
+# HTTP's "deflate" is the zlib format.
+WBITS = {"gzip": 31, "deflate": 15}
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Return the encoding the client prefers among gzip and deflate, or
+    None. Ties go to gzip; ``*`` stands for any encoding not listed."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[name] = quality
+    wildcard = weights.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in WBITS:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressible(content_type: bytes) -> bool:
+    content_type = content_type.split(b";")[0].strip().lower()
+    if content_type == b"text/event-stream":
+        # Change feed frames are small and must go out as they happen.
+        return False
+    return content_type.startswith(b"text/") or content_type.endswith(b"json")
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with gzip or deflate.
+
+    The encoding is negotiated from ``Accept-Encoding``. Bodies under
+    ``minimum_size`` bytes are sent as they are, since compressing them
+    costs more CPU than the bytes it saves. Streamed responses are held
+    back until they reach that size, then compressed chunk by chunk with a
+    sync flush, so every chunk still reaches the client as soon as it is
+    produced. Only text and JSON bodies are compressed, never the change
+    feed's event stream.
+
+    Compressed responses get ``Vary: Accept-Encoding`` and a weakened
+    ``ETag``, since their bytes differ from the uncompressed response.
+
+    Compressing a full page of items takes milliseconds, so chunks of at
+    least ``offload_size`` bytes are compressed on the threadpool (zlib
+    releases the GIL) instead of holding up the event loop.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        level: int = 6,
+        offload_size: int = 64 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.offload_size = offload_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = choose_encoding(value.decode("latin-1"))
+                break
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, CompressingSender(send, encoding, self))
+
+
+class CompressingSender:
+    """The ``send`` callable for one response, compressing its body."""
+
+    def __init__(self, send, encoding: str, middleware: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = middleware.minimum_size
+        self.level = middleware.level
+        self.offload_size = middleware.offload_size
+        self.start: Optional[dict] = None
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.compressor = None
+        # True once the response is known not to be compressed.
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.passthrough = not self._eligible(message.get("headers", []))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            return await self._send_compressed(body, more_body)
+
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if self.pending_size < self.minimum_size:
+            if more_body:
+                return
+            # Finished below the threshold: send it unchanged.
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": self._take()})
+            return
+
+        self.compressor = zlib.compressobj(
+            self.level, zlib.DEFLATED, WBITS[self.encoding]
+        )
+        headers = self._compressed_headers(self.start.get("headers", []))
+        if not more_body:
+            # The whole body is here, so its compressed length is known.
+            data = await self._compress(self._take(), zlib.Z_FINISH)
+            headers.append((b"content-length", str(len(data)).encode()))
+            await self.send(dict(self.start, headers=headers))
+            await self.send({"type": "http.response.body", "body": data})
+            return
+        await self.send(dict(self.start, headers=headers))
+        await self._send_compressed(self._take(), more_body)
+
+    async def _send_compressed(self, body: bytes, more_body: bool) -> None:
+        data = await self._compress(
+            body, zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        )
+        await self.send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+    async def _compress(self, body: bytes, mode: int) -> bytes:
+        if len(body) >= self.offload_size:
+            return await run_in_threadpool(self._compress_sync, body, mode)
+        return self._compress_sync(body, mode)
+
+    def _compress_sync(self, body: bytes, mode: int) -> bytes:
+        return self.compressor.compress(body) + self.compressor.flush(mode)
+
+    def _take(self) -> bytes:
+        body = b"".join(self.pending)
+        self.pending.clear()
+        return body
+
+    @staticmethod
+    def _eligible(headers: List[Tuple[bytes, bytes]]) -> bool:
+        content_type = None
+        for name, value in headers:
+            lowered = name.lower()
+            if lowered == b"content-encoding":
+                return False
+            if lowered == b"content-type":
+                content_type = value
+        return content_type is not None and compressible(content_type)
+
+    def _compressed_headers(
+        self, headers: List[Tuple[bytes, bytes]]
+    ) -> List[Tuple[bytes, bytes]]:
+        result = []
+        vary = None
+        for name, value in headers:
+            lowered = name.lower()
+            if lowered == b"content-length":
+                continue
+            if lowered == b"vary":
+                vary = value
+                continue
+            if lowered == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            result.append((name, value))
+        result.append((b"content-encoding", self.encoding.encode()))
+        result.append(
+            (
+                b"vary",
+                b"Accept-Encoding" if vary is None else vary + b", Accept-Encoding",
+            )
+        )
+        return result
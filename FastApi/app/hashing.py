@@ -0,0 +1,136 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+# Password hashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Calibration never goes below the cost still considered safe, nor so high
+# that one hash takes many seconds on a fast machine.
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 16
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password, also returning a new hash for it if the stored one
+    was made with older parameters, such as a lower bcrypt cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def set_bcrypt_rounds(rounds: int) -> None:
+    """Hash new passwords at this cost and count weaker hashes as needing
+    an update. Hashes at a higher cost are left alone, so machines that
+    calibrate differently do not rehash each other's passwords back and
+    forth."""
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def time_bcrypt(rounds: int, samples: int = 1) -> float:
+    """Return the fastest of ``samples`` hashes at this cost, in seconds."""
+    handler = bcrypt.using(rounds=rounds)
+    best = math.inf
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.hash("calibration")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate_bcrypt_rounds(
+    target_seconds: float,
+    min_rounds: int = MIN_BCRYPT_ROUNDS,
+    max_rounds: int = MAX_BCRYPT_ROUNDS,
+) -> Tuple[int, float]:
+    """Pick the bcrypt cost whose hash time is closest to ``target_seconds``
+    on this machine. Returns the cost and its measured hash time.
+
+    Each extra round doubles the work, so one timing at ``min_rounds`` is
+    enough to estimate the rest; the chosen cost is then timed for real.
+    """
+    probe = time_bcrypt(min_rounds, samples=3)
+    rounds = min_rounds + round(math.log2(target_seconds / probe))
+    rounds = max(min_rounds, min(max_rounds, rounds))
+    measured = probe if rounds == min_rounds else time_bcrypt(rounds)
+    return rounds, measured
+
+
+class HashingPoolBusy(Exception):
+    """Raised when too many hashing jobs are already queued."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """Runs bcrypt work in a dedicated process pool.
+
+    bcrypt is CPU bound, so running it on the request threadpool lets a burst
+    of logins starve every other endpoint. Jobs go to a separate set of
+    processes instead, and once ``max_pending`` jobs are queued or running,
+    new ones are rejected with ``HashingPoolBusy`` rather than piling up.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        retry_after: int = 1,
+        bcrypt_rounds: Optional[int] = None,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        # Applied in each worker process, which has its own pwd_context.
+        self.bcrypt_rounds = bcrypt_rounds
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            if self.bcrypt_rounds is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=set_bcrypt_rounds,
+                    initargs=(self.bcrypt_rounds,),
+                )
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        # Only touched from the event loop thread, so no lock is needed.
+        if self.pending >= self.max_pending:
+            raise HashingPoolBusy(self.retry_after)
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
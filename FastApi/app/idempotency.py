@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from serialization import dumps
+
+MAX_KEY_LENGTH = 255
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class Entry:
+    __slots__ = ("fingerprint", "expires_at", "response", "done")
+
+    def __init__(self, fingerprint: bytes):
+        self.fingerprint = fingerprint
+        self.expires_at = float("inf")
+        self.response: Optional[StoredResponse] = None
+        # Resolved when the first request finishes, with its response or
+        # None if it was not stored.
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class IdempotencyCache:
+    """Bounded LRU cache of responses by idempotency key, with a TTL.
+
+    An entry is created when the first request with a key starts and is
+    pending until that request finishes. Like the rate limiter it is only
+    used from the event loop thread, so it does no locking.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        ttl: float = 24 * 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[tuple, Entry]" = OrderedDict()
+        self.replays = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def start(self, key: tuple, fingerprint: bytes) -> Entry:
+        entry = self._entries[key] = Entry(fingerprint)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def finish(self, key: tuple, entry: Entry, response: Optional[StoredResponse]):
+        if response is None:
+            # Not stored, so the next request with this key runs again.
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        else:
+            entry.response = response
+            entry.expires_at = self._clock() + self.ttl
+        entry.done.set_result(response)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.replays = 0
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware making POSTs to ``paths`` safe to retry.
+
+    A request carrying an ``Idempotency-Key`` header runs once; later
+    requests with the same key get the stored response back without
+    reaching the app, so nothing is validated, hashed or written again.
+    Requests arriving while the first one is still running wait for it
+    instead of running themselves.
+
+    Keys are scoped per path and per user (``key_func(scope)``, or None for
+    anonymous requests). Reusing a key with a different body is rejected
+    with 422. Server errors and 429s are not stored, so those can be
+    retried for real.
+    """
+
+    max_response_size = 64 * 1024
+
+    def __init__(
+        self,
+        app,
+        cache: IdempotencyCache,
+        paths: Tuple[str, ...],
+        key_func: Optional[Callable[[dict], Optional[str]]] = None,
+    ):
+        self.app = app
+        self.cache = cache
+        self.paths = frozenset(paths)
+        self.key_func = key_func
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            return await self.app(scope, receive, send)
+        idempotency_key = None
+        for name, value in scope["headers"]:
+            if name == b"idempotency-key":
+                idempotency_key = value.decode("latin-1")
+                break
+        if idempotency_key is None:
+            return await self.app(scope, receive, send)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return await self._error(
+                send, 400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+            )
+
+        user = self.key_func(scope) if self.key_func is not None else None
+        key = (scope["path"], user, idempotency_key)
+        fingerprint, receive = await self._read_body(receive)
+
+        while True:
+            entry = self.cache.get(key)
+            if entry is None:
+                return await self._run_first(scope, receive, send, key, fingerprint)
+            if entry.fingerprint != fingerprint:
+                return await self._error(
+                    send, 422, "Idempotency-Key was already used for another request"
+                )
+            response = entry.response
+            if response is None:
+                # Shielded so a waiter giving up does not cancel the future
+                # the other waiters share.
+                response = await asyncio.shield(entry.done)
+                if response is None:
+                    # The first request's response was not stored; retry.
+                    continue
+            self.cache.replays += 1
+            return await self._replay(send, response)
+
+    async def _run_first(self, scope, receive, send, key, fingerprint):
+        entry = self.cache.start(key, fingerprint)
+        start_message = None
+        chunks = []
+        size = 0
+        storable = True
+
+        async def send_wrapper(message):
+            nonlocal start_message, size, storable
+            if message["type"] == "http.response.start":
+                start_message = message
+                status = message["status"]
+                storable = status < 500 and status != 429
+            elif message["type"] == "http.response.body" and storable:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > self.max_response_size:
+                    storable = False
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+            await send(message)
+
+        response = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+            if storable and start_message is not None:
+                response = StoredResponse(
+                    start_message["status"],
+                    list(start_message.get("headers", [])),
+                    b"".join(chunks),
+                )
+        finally:
+            self.cache.finish(key, entry, response)
+
+    @staticmethod
+    async def _read_body(receive):
+        messages = []
+        digest = hashlib.sha256()
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            digest.update(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        return digest.digest(), replay
+
+    @staticmethod
+    async def _replay(send, response: StoredResponse) -> None:
+        headers = response.headers + [(b"idempotent-replayed", b"true")]
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status,
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": response.body})
+
+    @staticmethod
+    async def _error(send, status: int, detail: str) -> None:
+        body = dumps({"detail": detail})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
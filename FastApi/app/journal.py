@@ -0,0 +1,440 @@
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Record types. Every record is a blind write (set or delete), so replaying
+# one that a snapshot already contains leaves the same state behind.
+USER_PUT = 1
+USER_DISABLED = 2
+ITEM_PUT = 3
+ITEM_DELETE = 4
+USERS_CLEAR = 5
+ITEMS_CLEAR = 6
+
+# Items are stored as tuples in this field order instead of dicts.
+ITEM_FIELDS = ("id", "owner", "name", "description", "price", "created_at")
+# Each record is framed as payload length + crc32, then the pickled payload.
+HEADER = struct.Struct("<II")
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".bin"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def item_to_row(item: dict) -> tuple:
+    # Datetimes become integer microseconds: smaller to pickle, and exact.
+    created_at = item["created_at"]
+    if created_at is not None:
+        created_at = (created_at - EPOCH) // MICROSECOND
+    return (
+        item["id"],
+        item["owner"],
+        item["name"],
+        item["description"],
+        item["price"],
+        created_at,
+    )
+
+
+def row_to_item(row: tuple) -> dict:
+    item = dict(zip(ITEM_FIELDS, row))
+    if item["created_at"] is not None:
+        item["created_at"] = EPOCH + item["created_at"] * MICROSECOND
+    return item
+
+
+def encode(record: tuple) -> bytes:
+    payload = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def segment_name(first_seq: int) -> str:
+    return f"{SEGMENT_PREFIX}{first_seq:020d}{SEGMENT_SUFFIX}"
+
+
+def snapshot_name(seq: int) -> str:
+    return f"{SNAPSHOT_PREFIX}{seq:020d}{SNAPSHOT_SUFFIX}"
+
+
+def list_files(directory: str, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+    """Return ``(seq, path)`` for the matching files, oldest first."""
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            seq = int(name[len(prefix) : -len(suffix)])
+            found.append((seq, os.path.join(directory, name)))
+    return sorted(found)
+
+
+def fsync_directory(directory: str) -> None:
+    # Makes file creations, renames and deletions in it durable.
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_segment(path: str) -> Iterator[tuple]:
+    """Yield the records of one segment.
+
+    A record cut short or failing its checksum is what a crash in the middle
+    of a write leaves behind. Reading stops there and the file is truncated
+    to the last good record, so later appends are not hidden behind it.
+    """
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        offset = 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            while offset + HEADER.size <= size:
+                length, checksum = HEADER.unpack_from(data, offset)
+                start = offset + HEADER.size
+                payload = data[start : start + length]
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                yield pickle.loads(payload)
+                offset = start + length
+        if offset < size:
+            logger.warning(
+                "Truncating %d bytes of torn journal tail in %s", size - offset, path
+            )
+            f.truncate(offset)
+            os.fsync(f.fileno())
+
+
+class JournalError(RuntimeError):
+    pass
+
+
+class Journal:
+    """Append-only write-ahead log with group commit.
+
+    ``append`` only encodes the record and adds it to an in-memory buffer,
+    returning its sequence number. A background thread writes everything
+    buffered since its last pass and fsyncs once for the whole batch, and
+    ``wait`` blocks until a given record is on disk. While one fsync is in
+    flight new records pile up, so under load many writes share each fsync.
+
+    The log is split into segments named after the sequence number of
+    their first record. ``rotate`` starts a new segment so a snapshot can
+    make the older ones unnecessary.
+    """
+
+    def __init__(self, directory: str, next_seq: int = 1, sync: bool = True):
+        self.directory = directory
+        self.sync = sync
+        self._lock = threading.Lock()
+        self._has_data = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._buffer: List[bytes] = []
+        self._next_seq = next_seq
+        self._durable_seq = next_seq - 1
+        self._segment_start = next_seq
+        self._rotate_requested = False
+        self._rotations = 0
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._file = self._open_segment(next_seq)
+        self._thread = threading.Thread(
+            target=self._run, name="journal-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+    @property
+    def segment_start(self) -> int:
+        return self._segment_start
+
+    def append(self, record: tuple) -> int:
+        data = encode(record)
+        with self._lock:
+            if self._closed:
+                raise JournalError("Journal is closed")
+            seq = self._next_seq
+            self._next_seq += 1
+            self._buffer.append(data)
+            self._has_data.notify()
+        return seq
+
+    def wait(self, seq: int) -> None:
+        """Block until the record ``seq`` and everything before it is durable."""
+        with self._lock:
+            while self._durable_seq < seq and self._error is None:
+                self._flushed.wait()
+            if self._error is not None:
+                raise JournalError("Journal write failed") from self._error
+
+    def rotate(self) -> int:
+        """Start a new segment and return the sequence number it starts at."""
+        with self._lock:
+            target = self._rotations + 1
+            self._rotate_requested = True
+            self._has_data.notify()
+            while self._rotations < target and self._error is None:
+                self._flushed.wait()
+            if self._error is not None:
+                raise JournalError("Journal write failed") from self._error
+            return self._segment_start
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._has_data.notify()
+        self._thread.join()
+        self._file.close()
+
+    def _open_segment(self, first_seq: int):
+        path = os.path.join(self.directory, segment_name(first_seq))
+        f = open(path, "ab")
+        fsync_directory(self.directory)
+        return f
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not (self._buffer or self._rotate_requested or self._closed):
+                    self._has_data.wait()
+                batch, self._buffer = self._buffer, []
+                last_seq = self._next_seq - 1
+                rotate, self._rotate_requested = self._rotate_requested, False
+                closing = self._closed
+            try:
+                if batch:
+                    self._file.write(b"".join(batch))
+                    self._file.flush()
+                    if self.sync:
+                        os.fsync(self._file.fileno())
+                if rotate:
+                    self._file.close()
+                    self._file = self._open_segment(last_seq + 1)
+            except OSError as exc:
+                logger.exception("Journal write failed")
+                with self._lock:
+                    self._error = exc
+                    self._flushed.notify_all()
+                return
+            with self._lock:
+                self._durable_seq = last_seq
+                if rotate:
+                    self._segment_start = last_seq + 1
+                    self._rotations += 1
+                self._flushed.notify_all()
+                if closing and not self._buffer:
+                    return
+
+
+class RecoveryStats(NamedTuple):
+    snapshot_seq: int
+    snapshot_users: int
+    snapshot_items: int
+    replayed: int
+    next_seq: int
+    seconds: float
+
+
+def write_snapshot(directory: str, seq: int, users, items) -> str:
+    """Write the stores to ``snapshot-<seq>.bin`` atomically."""
+    state = {
+        "seq": seq,
+        "users": list(users),
+        "items": [item_to_row(item) for item in items],
+        "last_item_id": items.last_id,
+    }
+    path = os.path.join(directory, snapshot_name(seq))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(directory)
+    return path
+
+
+class ReplayState:
+    """Latest user and item rows by key, rebuilt from a snapshot and the
+    journal. Records are applied to plain dicts, so replay costs one dict
+    operation per record; the stores' indexes are built once at the end."""
+
+    def __init__(self):
+        self.users: Dict[str, dict] = {}
+        self.items: Dict[int, tuple] = {}
+        self.last_item_id = 0
+
+    def apply(self, record: tuple) -> None:
+        kind = record[0]
+        if kind == ITEM_PUT:
+            row = record[1]
+            self.items[row[0]] = row
+            if row[0] > self.last_item_id:
+                self.last_item_id = row[0]
+        elif kind == ITEM_DELETE:
+            for item_id in record[1]:
+                self.items.pop(item_id, None)
+        elif kind == USER_PUT:
+            self.users[record[1]["username"]] = record[1]
+        elif kind == USER_DISABLED:
+            user = self.users.get(record[1])
+            if user is not None:
+                user["disabled"] = record[2]
+        elif kind == USERS_CLEAR:
+            self.users.clear()
+        elif kind == ITEMS_CLEAR:
+            self.items.clear()
+            self.last_item_id = 0
+        else:
+            raise JournalError(f"Unknown journal record type {kind}")
+
+
+def recover(directory: str, users, items) -> RecoveryStats:
+    """Load the latest snapshot into the (empty) stores and replay the
+    journal written after it. Returns where the journal should continue."""
+    start = time.perf_counter()
+    state = ReplayState()
+    snapshot_seq = 1
+    snapshot_users = snapshot_items = 0
+    snapshots = list_files(directory, SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+    if snapshots:
+        snapshot_seq, path = snapshots[-1]
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        state.users = {user["username"]: user for user in snapshot["users"]}
+        state.items = {row[0]: row for row in snapshot["items"]}
+        state.last_item_id = snapshot["last_item_id"]
+        snapshot_users = len(state.users)
+        snapshot_items = len(state.items)
+
+    # Segments older than the snapshot are leftovers of an interrupted
+    # cleanup; everything in them is already in the snapshot.
+    next_seq = snapshot_seq
+    replayed = 0
+    for first_seq, path in list_files(directory, SEGMENT_PREFIX, SEGMENT_SUFFIX):
+        if first_seq < snapshot_seq:
+            continue
+        next_seq = first_seq
+        for record in read_segment(path):
+            state.apply(record)
+            next_seq += 1
+            replayed += 1
+
+    for user in state.users.values():
+        users.restore(user)
+    items.load([row_to_item(row) for row in state.items.values()], state.last_item_id)
+    return RecoveryStats(
+        snapshot_seq,
+        snapshot_users,
+        snapshot_items,
+        replayed,
+        next_seq,
+        time.perf_counter() - start,
+    )
+
+
+class DurableStorage:
+    """Makes an in-memory ``UserStore`` and ``ItemStore`` survive restarts.
+
+    ``open`` recovers the stores from ``directory``, then attaches a
+    ``Journal`` that every write is appended to. A background thread takes
+    a snapshot once ``snapshot_every`` records have been journaled since
+    the last one, after which older segments and snapshots are deleted.
+
+    Snapshots are taken while writes continue. The journal is rotated
+    first, so the snapshot holds everything before the new segment and
+    possibly some of what follows; replaying those records again is
+    harmless because every record is a blind write.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        users,
+        items,
+        sync: bool = True,
+        snapshot_every: int = 1_000_000,
+        check_interval: float = 5.0,
+    ):
+        self.directory = directory
+        self.users = users
+        self.items = items
+        self.sync = sync
+        self.snapshot_every = snapshot_every
+        self.check_interval = check_interval
+        self.journal: Optional[Journal] = None
+        self.recovery: Optional[RecoveryStats] = None
+        self._snapshot_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self) -> RecoveryStats:
+        os.makedirs(self.directory, exist_ok=True)
+        self.recovery = recover(self.directory, self.users, self.items)
+        logger.info(
+            "Recovered %d users and %d items from snapshot %d and replayed "
+            "%d journal records in %.2fs",
+            self.recovery.snapshot_users,
+            self.recovery.snapshot_items,
+            self.recovery.snapshot_seq,
+            self.recovery.replayed,
+            self.recovery.seconds,
+        )
+        self.journal = Journal(self.directory, self.recovery.next_seq, self.sync)
+        self.users.journal = self.journal
+        self.items.journal = self.journal
+        self._thread = threading.Thread(
+            target=self._run, name="journal-snapshots", daemon=True
+        )
+        self._thread.start()
+        return self.recovery
+
+    def snapshot(self) -> int:
+        """Snapshot the stores now and drop what the snapshot replaces."""
+        with self._snapshot_lock:
+            seq = self.journal.rotate()
+            write_snapshot(self.directory, seq, self.users, self.items)
+            for old_seq, path in list_files(
+                self.directory, SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX
+            ):
+                if old_seq < seq:
+                    os.remove(path)
+            for first_seq, path in list_files(
+                self.directory, SEGMENT_PREFIX, SEGMENT_SUFFIX
+            ):
+                if first_seq < seq:
+                    os.remove(path)
+            fsync_directory(self.directory)
+            return seq
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.journal is not None:
+            self.snapshot()
+            self.users.journal = None
+            self.items.journal = None
+            self.journal.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            pending = self.journal.next_seq - self.journal.segment_start
+            if pending >= self.snapshot_every:
+                try:
+                    self.snapshot()
+                except (OSError, JournalError):
+                    logger.exception("Snapshot failed")
@@ -1,28 +1,327 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import (
+    Body,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    EmailStr,
+    Field,
+    TypeAdapter,
+    ValidationError,
+    field_validator,
+)
+from typing import Annotated, Any, Literal, Optional, List, Tuple, Union
 from datetime import datetime, timedelta
+import math
+import os
+import zlib
 import jwt
-from passlib.context import CryptContext
+
+from async_storage import AsyncStorage
+from changes import ChangeFeed
+from compression import CompressionMiddleware
+from hashing import (
+    HashingPool,
+    HashingPoolBusy,
+    calibrate_bcrypt_rounds,
+    hash_password,
+    set_bcrypt_rounds,
+    time_bcrypt,
+    verify_and_update,
+)
+from idempotency import IdempotencyCache, IdempotencyMiddleware
+from journal import DurableStorage
+from metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry
+from rate_limit import RateLimit, RateLimitMiddleware, TokenBucketLimiter
+from refresh_tokens import RefreshTokenStore
+from repository import ItemRepository, UserRepository, normalize_email
+from serialization import TrustedJSONResponse, dumps
+from sqlite_store import SQLiteDatabase, SQLiteItemRepository, SQLiteUserRepository
+from store import Compactor, ItemStore, UserStore
+from token_cache import TokenCache
+from user_directory import UserDirectory
 
 # Configuration
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Refresh tokens renew access tokens without the password (and its bcrypt
+# round). They are held in memory, so only the issuing worker accepts them.
+REFRESH_TOKEN_EXPIRE_DAYS = 7
+REFRESH_TOKEN_STORE_SIZE = 100_000
+TOKEN_CACHE_SIZE = 10_000
+USER_DIRECTORY_SIZE = 10_000
+HASH_POOL_WORKERS = 2
+HASH_QUEUE_LIMIT = 64
+HASH_RETRY_AFTER_SECONDS = 1
+# At startup the bcrypt cost is set so one hash takes about this long here.
+# Set BCRYPT_ROUNDS to pin the cost instead. Stored hashes below the cost
+# are upgraded the next time their user logs in.
+BCRYPT_TARGET_SECONDS = float(os.getenv("BCRYPT_TARGET_SECONDS", "0.25"))
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+MAX_PAGE_SIZE = 1000
+# Pages and bulk batches of more items than this are read, serialized,
+# validated and written on the threadpool rather than on the event loop.
+INLINE_ITEMS = 200
+STREAM_CHUNK_SIZE = 500
+MAX_BULK_SIZE = 5000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# "memory" keeps everything in this process; "sqlite" persists to SQLITE_PATH
+# and lets several uvicorn workers share the same data.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "app.db")
+# With the memory backend, set JOURNAL_DIR to journal every write there and
+# recover from it on startup. JOURNAL_FSYNC=0 trades durability on power
+# loss for speed (a crashed process still loses nothing).
+JOURNAL_DIR = os.getenv("JOURNAL_DIR")
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "1") != "0"
+SNAPSHOT_EVERY = 1_000_000
+# Deleted items leave tombstones in the memory backend's indexes; an owner's
+# index is compacted once this share of it is tombstones.
+COMPACTION_THRESHOLD = 0.25
+COMPACTION_INTERVAL_SECONDS = 1.0
+# COMPACT_ITEMS=1 holds memory-backend items as slotted records instead of
+# dicts: far less memory per item for a little CPU on every read.
+COMPACT_ITEMS = os.getenv("COMPACT_ITEMS", "0") != "0"
+# GET /items/changes can resume from any of an owner's last N changes.
+CHANGE_FEED_BUFFER = 256
+CHANGE_FEED_MAX_OWNERS = 10_000
+CHANGE_FEED_HEARTBEAT_SECONDS = 15.0
+# Requests per second and burst size, per client. Login and register are
+# strict because each attempt costs a bcrypt round.
+RATE_LIMITS = {
+    "/auth/login": RateLimit(rate=1, burst=5),
+    "/auth/register": RateLimit(rate=0.2, burst=3),
+}
+DEFAULT_RATE_LIMIT = RateLimit(rate=50, burst=100)
+# Login is counted per account and also per client IP, so one client cannot
+# spread its guesses over many usernames. Looser than the per-account limit,
+# since many users can share an address.
+CLIENT_RATE_LIMITS = {"/auth/login": RateLimit(rate=5, burst=20)}
+RATE_LIMIT_MAX_BUCKETS = 100_000
+# Set RATE_LIMIT_ENABLED=0 for load testing from a single client.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# Stored responses for requests sent with an Idempotency-Key header.
+IDEMPOTENCY_CACHE_SIZE = 10_000
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+# Responses of at least this many bytes are gzip/deflate compressed for
+# clients that accept it. COMPRESSION_LEVEL runs from 1 (fastest) to 9
+# (smallest); 0 turns compression off.
+COMPRESSION_MINIMUM_SIZE = 1024
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
 
 # Initialize FastAPI app
 app = FastAPI(title="Simple FastAPI with Auth", version="1.0.0")
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing runs in its own processes, off the request threadpool
+if BCRYPT_ROUNDS:
+    bcrypt_rounds = int(BCRYPT_ROUNDS)
+    bcrypt_hash_seconds = time_bcrypt(bcrypt_rounds)
+else:
+    bcrypt_rounds, bcrypt_hash_seconds = calibrate_bcrypt_rounds(BCRYPT_TARGET_SECONDS)
+set_bcrypt_rounds(bcrypt_rounds)
+hashing_pool = HashingPool(
+    max_workers=HASH_POOL_WORKERS,
+    max_pending=HASH_QUEUE_LIMIT,
+    retry_after=HASH_RETRY_AFTER_SECONDS,
+    bcrypt_rounds=bcrypt_rounds,
+)
 
 # Security
 security = HTTPBearer()
 
-# In-memory databases (replace with real database in production)
-users_db = {}
-items_db = []
+# Databases
+users_db: UserRepository
+items_db: ItemRepository
+durable_storage: Optional[DurableStorage] = None
+compactor: Optional[Compactor] = None
+if STORAGE_BACKEND == "sqlite":
+    sqlite_db = SQLiteDatabase(SQLITE_PATH)
+    users_db = SQLiteUserRepository(sqlite_db)
+    items_db = SQLiteItemRepository(sqlite_db)
+elif STORAGE_BACKEND == "memory":
+    users_db = UserStore()
+    items_db = ItemStore(compact_items=COMPACT_ITEMS)
+    if JOURNAL_DIR:
+        durable_storage = DurableStorage(
+            JOURNAL_DIR,
+            users_db,
+            items_db,
+            sync=JOURNAL_FSYNC,
+            snapshot_every=SNAPSHOT_EVERY,
+        )
+        durable_storage.open()
+    compactor = Compactor(
+        items_db, COMPACTION_THRESHOLD, interval=COMPACTION_INTERVAL_SECONDS
+    )
+    compactor.start()
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND!r}")
+# Endpoints are async. Storage calls that can block (SQLite, or waiting for
+# the journal) go to the threadpool; plain in-memory calls run inline.
+storage = AsyncStorage(
+    reads_block=STORAGE_BACKEND == "sqlite",
+    writes_block=STORAGE_BACKEND == "sqlite" or durable_storage is not None,
+)
+
+# Verified bearer tokens, so repeat requests skip jwt.decode and User building
+token_cache = TokenCache(maxsize=TOKEN_CACHE_SIZE)
+# Live refresh tokens, by digest
+refresh_tokens = RefreshTokenStore(
+    maxsize=REFRESH_TOKEN_STORE_SIZE, ttl=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+)
+# Prebuilt User models, so a new token for a known user skips building one.
+# Every user write goes through it.
+user_directory = UserDirectory(
+    users_db, lambda user_data: User(**user_data), maxsize=USER_DIRECTORY_SIZE
+)
+
+# Item changes for GET /items/changes subscribers
+change_feed = ChangeFeed(
+    capacity=CHANGE_FEED_BUFFER,
+    max_owners=CHANGE_FEED_MAX_OWNERS,
+    heartbeat=CHANGE_FEED_HEARTBEAT_SECONDS,
+)
+
+# Metrics, exposed in Prometheus text format on /metrics
+metrics = Registry()
+request_latency = metrics.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency by route",
+        labelnames=("method", "route"),
+    )
+)
+responses_total = metrics.register(
+    Counter(
+        "http_responses_total",
+        "Responses by route and status code",
+        labelnames=("method", "route", "status"),
+    )
+)
+requests_in_flight = metrics.register(
+    Gauge("http_requests_in_flight", "Requests currently being handled")
+)
+operation_latency = metrics.register(
+    Histogram(
+        "app_operation_duration_seconds",
+        "Latency of hashing, token decoding and item lookups",
+        labelnames=("operation",),
+    )
+)
+metrics.register(
+    Gauge(
+        "password_hash_jobs_pending",
+        "Hashing jobs queued or running",
+        lambda: hashing_pool.pending,
+    )
+)
+metrics.register(
+    Gauge("bcrypt_rounds", "bcrypt cost used for new hashes", lambda: bcrypt_rounds)
+)
+metrics.register(
+    Gauge(
+        "bcrypt_hash_seconds",
+        "Time one hash took at the chosen cost, measured at startup",
+        lambda: bcrypt_hash_seconds,
+    )
+)
+password_rehashes = metrics.register(
+    Counter(
+        "password_rehashes_total",
+        "Stored hashes upgraded to the current parameters on login",
+    )
+)
+metrics.register(
+    Gauge("token_cache_hits", "Token cache hits", lambda: token_cache.hits)
+)
+metrics.register(
+    Gauge("token_cache_misses", "Token cache misses", lambda: token_cache.misses)
+)
+metrics.register(
+    Gauge(
+        "user_directory_hits",
+        "Users found already built in the user directory",
+        lambda: user_directory.hits,
+    )
+)
+metrics.register(
+    Gauge(
+        "user_directory_misses",
+        "Users loaded from storage into the user directory",
+        lambda: user_directory.misses,
+    )
+)
+metrics.register(
+    Gauge(
+        "refresh_tokens",
+        "Refresh tokens held, live or recently spent",
+        lambda: len(refresh_tokens),
+    )
+)
+metrics.register(
+    Gauge(
+        "refresh_token_rotations",
+        "Access tokens renewed with a refresh token",
+        lambda: refresh_tokens.rotations,
+    )
+)
+metrics.register(
+    Gauge(
+        "refresh_token_reuses",
+        "Spent refresh tokens presented again, revoking their session",
+        lambda: refresh_tokens.reuses,
+    )
+)
+metrics.register(
+    Gauge(
+        "idempotent_replays",
+        "Stored responses returned for a repeated Idempotency-Key",
+        lambda: idempotency_cache.replays,
+    )
+)
+metrics.register(
+    Gauge(
+        "change_feed_subscribers",
+        "Open GET /items/changes streams",
+        lambda: change_feed.subscribers,
+    )
+)
+metrics.register(
+    Gauge(
+        "change_feed_resets",
+        "Change streams ended because they fell behind the buffer",
+        lambda: change_feed.resets,
+    )
+)
+if compactor is not None:
+    metrics.register(
+        Gauge(
+            "item_tombstones",
+            "Deleted items still in the memory backend's indexes",
+            lambda: compactor.items.tombstones,
+        )
+    )
+    metrics.register(
+        Gauge(
+            "item_tombstones_removed",
+            "Tombstones dropped by background compaction",
+            lambda: compactor.removed,
+        )
+    )
 
 
 # Models
@@ -32,13 +331,26 @@ class UserRegister(BaseModel):
     password: str
     full_name: Optional[str] = None
 
+    @field_validator("username")
+    @classmethod
+    def username_is_not_an_email(cls, username: str) -> str:
+        # Logins containing "@" may be emails, so a username shaped like
+        # someone else's email must not be able to claim their logins.
+        if "@" in username:
+            raise ValueError("Username cannot contain '@'")
+        return username
+
 
 class UserLogin(BaseModel):
+    # A username, or the email address the user registered with.
     username: str
     password: str
 
 
 class User(BaseModel):
+    # Frozen, since one instance is shared by every request for the user.
+    model_config = ConfigDict(frozen=True)
+
     username: str
     email: str
     full_name: Optional[str] = None
@@ -48,24 +360,81 @@ class User(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+# NaN or infinite prices would break the sorted price index, so they are
+# rejected wherever a price comes in.
+Price = Annotated[float, Field(allow_inf_nan=False)]
 
 
 class Item(BaseModel):
     id: Optional[int] = None
     name: str
     description: Optional[str] = None
-    price: float
+    price: Price
     owner: Optional[str] = None
     created_at: Optional[datetime] = None
 
 
-# Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+class ItemPatch(BaseModel):
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[Price] = None
+
+    @field_validator("name", "price")
+    @classmethod
+    def required_field_is_not_null(cls, value):
+        # Leaving a field out keeps it; only description may be set to null.
+        if value is None:
+            raise ValueError("Field cannot be null")
+        return value
+
+
+class BulkDelete(BaseModel):
+    ids: List[int]
+
+
+class BulkError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    detail: Any
+
+
+class BulkResult(BaseModel):
+    items: List[Item] = []
+    deleted: List[int] = []
+    errors: List[BulkError] = []
+
+
+class ItemStats(BaseModel):
+    count: int
+    total_price: float
+    average_price: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+item_list_adapter = TypeAdapter(List[Item])
+item_patch_list_adapter = TypeAdapter(List[ItemPatch])
+
+
+# Helper functions
+async def run_hashing(fn, *args):
+    try:
+        with operation_latency.time(fn.__name__):
+            return await hashing_pool.run(fn, *args)
+    except HashingPoolBusy as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
 
 
 def create_access_token(data: dict) -> str:
@@ -76,6 +445,14 @@ def create_access_token(data: dict) -> str:
     return encoded_jwt
 
 
+def issue_tokens(username: str, refresh_token: str) -> Token:
+    return Token(
+        access_token=create_access_token(data={"sub": username}),
+        token_type="bearer",
+        refresh_token=refresh_token,
+    )
+
+
 def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -84,58 +461,182 @@ def decode_token(token: str) -> dict:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired"
         )
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> User:
     token = credentials.credentials
-    payload = decode_token(token)
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
+    with operation_latency.time("decode_token"):
+        payload = decode_token(token)
     username = payload.get("sub")
 
-    if username is None or username not in users_db:
+    user = None
+    if username is not None:
+        user = user_directory.cached(username)
+        if user is None:
+            user = await storage.read(user_directory.get, username)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
         )
 
-    user_data = users_db[username]
-    return User(**user_data)
+    if user.disabled:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
+        )
+
+    token_cache.put(token, payload, user)
+    return user
+
+
+def set_user_disabled(username: str, disabled: bool = True) -> None:
+    user_directory.set_disabled(username, disabled)
+    token_cache.invalidate_user(username)
+    if disabled:
+        refresh_tokens.revoke_user(username)
+
+
+async def registration_conflict(user: UserRegister) -> Optional[str]:
+    if await storage.read(users_db.get, user.username) is not None:
+        return "Username already registered"
+    if await storage.read(users_db.get_by_email, user.email) is not None:
+        return "Email already registered"
+    # Accounts from before usernames were barred from holding "@" can have
+    # a username equal to this email, and login would find them first.
+    if await storage.read(users_db.get, user.email) is not None:
+        return "Email already registered"
+    return None
+
+
+def bearer_token(scope: dict) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token if scheme.lower() == "bearer" else None
+    return None
+
+
+def rate_limit_key(scope: dict) -> Optional[str]:
+    # Only trust usernames from tokens we have already verified; anything
+    # else is limited by client IP.
+    token = bearer_token(scope)
+    return None if token is None else token_cache.username_for(token)
+
+
+def login_rate_limit_key(login: str) -> str:
+    # Email logins ignore case and surrounding spaces, so each spelling of
+    # one address must land in the same bucket.
+    return normalize_email(login) if "@" in login else login
+
+
+def idempotency_user(scope: dict) -> Optional[str]:
+    # Verify the token here rather than trusting the cache alone, so a
+    # retry is matched to the same user whether or not the first attempt
+    # got as far as caching it. Invalid tokens share the anonymous scope.
+    token = bearer_token(scope)
+    if token is None:
+        return None
+    username = token_cache.username_for(token)
+    if username is None:
+        try:
+            username = decode_token(token).get("sub")
+        except HTTPException:
+            return None
+    return username
+
+
+idempotency_cache = IdempotencyCache(
+    maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL_SECONDS
+)
+app.add_middleware(
+    IdempotencyMiddleware,
+    cache=idempotency_cache,
+    paths=("/items", "/auth/register"),
+    key_func=idempotency_user,
+)
+rate_limiter = TokenBucketLimiter(max_buckets=RATE_LIMIT_MAX_BUCKETS)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=rate_limiter,
+        rules=RATE_LIMITS,
+        default=DEFAULT_RATE_LIMIT,
+        key_func=rate_limit_key,
+        body_username_paths=("/auth/login",),
+        body_username_key=login_rate_limit_key,
+        client_rules=CLIENT_RATE_LIMITS,
+    )
+# Outside the idempotency cache, so stored responses are kept uncompressed
+# and a replay is encoded for whoever sent it.
+if COMPRESSION_LEVEL:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=COMPRESSION_MINIMUM_SIZE,
+        level=COMPRESSION_LEVEL,
+    )
+# Added last so it wraps everything, including rate-limited requests.
+app.add_middleware(
+    MetricsMiddleware,
+    latency=request_latency,
+    responses=responses_total,
+    in_flight=requests_in_flight,
+)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # Same body as FastAPI's handler, but its json.dumps raises on the NaN
+    # and infinite inputs that price validation rejects; dumps writes null.
+    return TrustedJSONResponse(
+        {"detail": jsonable_encoder(exc.errors())},
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
 
 
 # Routes
 @app.get("/")
-def root():
+async def root():
     return {
         "message": "Welcome to FastAPI with Authentication",
         "endpoints": {
             "register": "POST /auth/register",
             "login": "POST /auth/login",
+            "refresh": "POST /auth/refresh",
+            "logout": "POST /auth/logout",
             "me": "GET /auth/me (protected)",
             "items": "GET /items (protected)",
             "create_item": "POST /items (protected)",
             "get_item": "GET /items/{item_id} (protected)",
             "update_item": "PUT /items/{item_id} (protected)",
             "delete_item": "DELETE /items/{item_id} (protected)",
+            "bulk_create": "POST /items/bulk (protected)",
+            "bulk_update": "PATCH /items/bulk (protected)",
+            "bulk_delete": "DELETE /items/bulk (protected)",
+            "search": "GET /items/search?q= (protected)",
+            "metrics": "GET /metrics",
         },
     }
 
 
 # Authentication endpoints
 @app.post("/auth/register", response_model=User, status_code=status.HTTP_201_CREATED)
-def register(user: UserRegister):
-    if user.username in users_db:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered",
-        )
+async def register(user: UserRegister):
+    conflict = await registration_conflict(user)
+    if conflict is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=conflict)
 
-    hashed_password = hash_password(user.password)
+    hashed_password = await run_hashing(hash_password, user.password)
     user_data = {
         "username": user.username,
         "email": user.email,
@@ -143,7 +644,14 @@ def register(user: UserRegister):
         "hashed_password": hashed_password,
         "disabled": False,
     }
-    users_db[user.username] = user_data
+    # Another request may have taken the name or email while we were hashing.
+    if not await storage.write(user_directory.add, user_data):
+        conflict = await registration_conflict(user)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=conflict or "Username already registered",
+        )
+    token_cache.invalidate_user(user.username)
 
     return User(
         username=user.username,
@@ -154,96 +662,576 @@ def register(user: UserRegister):
 
 
 @app.post("/auth/login", response_model=Token)
-def login(user_login: UserLogin):
-    if user_login.username not in users_db:
+async def login(user_login: UserLogin):
+    user_data = await storage.read(user_directory.find, user_login.username)
+    # Like refresh, a disabled account is turned away before any password
+    # check, so it costs no bcrypt round and gets no refresh token.
+    if user_data is None or user_data["disabled"]:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
 
-    user_data = users_db[user_login.username]
-    if not verify_password(user_login.password, user_data["hashed_password"]):
+    verified, new_hash = await run_hashing(
+        verify_and_update, user_login.password, user_data["hashed_password"]
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
+    if new_hash is not None:
+        # Hashed at an older cost; the pool worker has already rehashed it.
+        await storage.write(
+            user_directory.set_hashed_password, user_data["username"], new_hash
+        )
+        password_rehashes.inc()
+
+    return issue_tokens(
+        user_data["username"], refresh_tokens.issue(user_data["username"])
+    )
+
+
+@app.post("/auth/refresh", response_model=Token)
+async def refresh(body: RefreshRequest):
+    rotated = refresh_tokens.rotate(body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+        )
+    username, refresh_token = rotated
+
+    user = user_directory.cached(username)
+    if user is None:
+        user = await storage.read(user_directory.get, username)
+    if user is None or user.disabled:
+        refresh_tokens.revoke_user(username)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+        )
+    return issue_tokens(username, refresh_token)
 
-    access_token = create_access_token(data={"sub": user_login.username})
-    return Token(access_token=access_token, token_type="bearer")
+
+@app.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: RefreshRequest):
+    # Ends the refresh token's session. Access tokens already issued stay
+    # valid until they expire.
+    refresh_tokens.revoke(body.refresh_token)
 
 
 @app.get("/auth/me", response_model=User)
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/auth/token-cache")
+async def get_token_cache_stats(current_user: User = Depends(get_current_user)):
+    return token_cache.stats()
+
+
 # CRUD endpoints for items (protected)
+async def get_owned_item(item_id: int, username: str, action: str) -> dict:
+    with operation_latency.time("item_get"):
+        item = await storage.read(items_db.get, item_id)
+    if item is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
+        )
+    if item["owner"] != username:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not authorized to {action} this item",
+        )
+    return item
+
+
+# Item writes. Each one publishes its changes to the change feed in the
+# same order as the owner's writes were applied. They are plain functions
+# so that storage.write can run a whole one on the threadpool. The wait
+# for the journal to make a write durable comes after the owner's feed
+# lock is released, so the owner's other writes can share its fsync.
+def write_created(owner: str, new_items: List[dict]) -> List[dict]:
+    with items_db.deferred_commit(), change_feed.ordered(owner):
+        created = items_db.create_many(new_items)
+        change_feed.publish(owner, "created", created)
+    return created
+
+
+def write_updated(owner: str, item: dict) -> dict:
+    with items_db.deferred_commit(), change_feed.ordered(owner):
+        items_db.replace(item)
+        change_feed.publish(owner, "updated", [item])
+    return item
+
+
+def write_updated_many(owner: str, items: List[dict]) -> List[dict]:
+    with items_db.deferred_commit(), change_feed.ordered(owner):
+        updated = items_db.replace_many(items)
+        change_feed.publish(owner, "updated", updated)
+    return updated
+
+
+def write_deleted(owner: str, item_id: int) -> None:
+    with items_db.deferred_commit(), change_feed.ordered(owner):
+        items_db.remove(item_id)
+        change_feed.publish(owner, "deleted", [{"id": item_id}])
+
+
+def write_deleted_many(owner: str, item_ids: List[int]) -> None:
+    with items_db.deferred_commit(), change_feed.ordered(owner):
+        items_db.remove_many(item_ids)
+        change_feed.publish(owner, "deleted", [{"id": item_id} for item_id in item_ids])
+
+
 @app.post("/items", response_model=Item, status_code=status.HTTP_201_CREATED)
-def create_item(item: Item, current_user: User = Depends(get_current_user)):
-    new_item = item.dict()
-    new_item["id"] = len(items_db) + 1
+async def create_item(item: Item, current_user: User = Depends(get_current_user)):
+    new_item = item.model_dump()
     new_item["owner"] = current_user.username
     new_item["created_at"] = datetime.utcnow()
-    items_db.append(new_item)
-    return new_item
+    created = await storage.write(write_created, current_user.username, [new_item])
+    return TrustedJSONResponse(created[0], status_code=status.HTTP_201_CREATED)
+
+
+ItemSort = Literal["created_at", "price"]
+# Keyset position: an id, or a (price, id) pair when sorting by price.
+Cursor = Union[int, Tuple[float, int]]
+
+
+class ItemQuery:
+    """The owner, sort order and price range of a GET /items request."""
+
+    def __init__(
+        self,
+        owner: str,
+        sort: ItemSort,
+        min_price: Optional[float],
+        max_price: Optional[float],
+    ):
+        self.owner = owner
+        self.sort = sort
+        self.min_price = min_price
+        self.max_price = max_price
+
+    def page(self, after: Optional[Cursor], limit: Optional[int]) -> List[dict]:
+        if self.sort == "price":
+            return items_db.page_by_price(
+                self.owner, self.min_price, self.max_price, after=after, limit=limit
+            )
+        # Ids are handed out in creation order.
+        return items_db.page_by_owner(
+            self.owner,
+            after=after,
+            limit=limit,
+            min_price=self.min_price,
+            max_price=self.max_price,
+        )
+
+    def cursor_after(self, item: dict) -> Cursor:
+        if self.sort == "price":
+            return item["price"], item["id"]
+        return item["id"]
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[Cursor]:
+        if cursor is None:
+            return None
+        try:
+            if self.sort == "price":
+                price, item_id = cursor.split(":")
+                if not math.isfinite(float(price)):
+                    raise ValueError(price)
+                return float(price), int(item_id)
+            return int(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Invalid cursor",
+            )
+
+    @staticmethod
+    def format_cursor(cursor: Cursor) -> str:
+        if isinstance(cursor, tuple):
+            return f"{cursor[0]!r}:{cursor[1]}"
+        return str(cursor)
+
+
+def stream_items(query: ItemQuery, after: Optional[Cursor], limit: Optional[int]):
+    # Walk the owner's items in keyset chunks so only one chunk is held in
+    # memory at a time, and writes between chunks cannot shift our position.
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = (
+            STREAM_CHUNK_SIZE
+            if remaining is None
+            else min(remaining, STREAM_CHUNK_SIZE)
+        )
+        chunk = query.page(after, size)
+        if not chunk:
+            return
+        yield b"".join(dumps(item) + b"\n" for item in chunk)
+        after = query.cursor_after(chunk[-1])
+        if remaining is not None:
+            remaining -= len(chunk)
+
+
+def render_page(
+    query: ItemQuery, after: Optional[Cursor], limit: Optional[int]
+) -> Tuple[bytes, Optional[str]]:
+    """Return a page as JSON, with the cursor of the next page if any."""
+    # Fetch one extra item to know whether another page exists.
+    page = query.page(after, None if limit is None else limit + 1)
+    next_cursor = None
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        next_cursor = query.format_cursor(query.cursor_after(page[-1]))
+    return dumps(page), next_cursor
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
 
 @app.get("/items", response_model=List[Item])
-def get_items(current_user: User = Depends(get_current_user)):
+async def get_items(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(
+        None, description="Resume after this position (from X-Next-Cursor)"
+    ),
+    sort: ItemSort = Query("created_at", description="Order by creation or price"),
+    min_price: Optional[Price] = Query(None, description="Lowest price to include"),
+    max_price: Optional[Price] = Query(None, description="Highest price to include"),
+    current_user: User = Depends(get_current_user),
+):
     # Return only items owned by current user
-    user_items = [item for item in items_db if item["owner"] == current_user.username]
-    return user_items
+    query = ItemQuery(current_user.username, sort, min_price, max_price)
+    after = query.parse_cursor(cursor)
+    stream = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    # The owner's version changes on every write to their items, and the
+    # query hash tells different pages and formats apart.
+    query_hash = zlib.crc32(f"{request.url.query}|{stream}".encode())
+    version = await storage.read(items_db.owner_version, current_user.username)
+    etag = make_etag(version, query_hash)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
+    if stream:
+        # A sync generator, so Starlette iterates it on the threadpool.
+        return StreamingResponse(
+            stream_items(query, after, limit),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"ETag": etag},
+        )
 
-@app.get("/items/{item_id}", response_model=Item)
-def get_item(item_id: int, current_user: User = Depends(get_current_user)):
-    for item in items_db:
-        if item["id"] == item_id:
-            if item["owner"] != current_user.username:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Not authorized to access this item",
-                )
-            return item
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    # A price filter in creation order may read far more items than it
+    # returns, so it counts as large too.
+    large = (
+        limit is None
+        or limit > INLINE_ITEMS
+        or (sort == "created_at" and (min_price, max_price) != (None, None))
+    )
+    with operation_latency.time("item_page"):
+        body, next_cursor = await storage.read(
+            render_page, query, after, limit, large=large
+        )
+    headers = {"ETag": etag}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(body, media_type="application/json", headers=headers)
 
 
-@app.put("/items/{item_id}", response_model=Item)
-def update_item(
-    item_id: int, item_update: Item, current_user: User = Depends(get_current_user)
+@app.get("/items/stats", response_model=ItemStats)
+async def get_item_stats(current_user: User = Depends(get_current_user)):
+    # Read from running aggregates, so this costs the same for any item count.
+    with operation_latency.time("item_stats"):
+        return await storage.read(items_db.stats, current_user.username)
+
+
+@app.get("/items/changes")
+async def stream_item_changes(
+    since: Optional[int] = Query(
+        None, description="Resume after this event id instead of starting now"
+    ),
+    last_event_id: Optional[int] = Header(None),
+    current_user: User = Depends(get_current_user),
 ):
-    for idx, item in enumerate(items_db):
-        if item["id"] == item_id:
-            if item["owner"] != current_user.username:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Not authorized to update this item",
-                )
-            updated_item = item.copy()
-            updated_item.update(
+    # EventSource sends Last-Event-ID by itself when it reconnects.
+    after = since if since is not None else last_event_id
+    return StreamingResponse(
+        change_feed.subscribe(current_user.username, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/items/changes/stats")
+async def get_change_feed_stats(current_user: User = Depends(get_current_user)):
+    return change_feed.stats()
+
+
+@app.get("/items/compaction")
+async def get_compaction_stats(current_user: User = Depends(get_current_user)):
+    if compactor is None:
+        # The SQLite backend deletes rows outright and has nothing to compact.
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Compaction is only used by the memory backend",
+        )
+    return compactor.stats()
+
+
+@app.get("/items/search", response_model=List[Item])
+async def search_items(
+    q: str = Query(..., min_length=1, description="Words to look for"),
+    prefix: bool = Query(False, description="Also match words starting with each term"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+):
+    # Items matching every word of q in name or description, best match first.
+    # Its cost follows how many items share those words, not the limit, so
+    # it always runs on the threadpool.
+    with operation_latency.time("item_search"):
+        results = await storage.read(
+            items_db.search, current_user.username, q, prefix, limit, large=True
+        )
+    return TrustedJSONResponse(results)
+
+
+def check_bulk_size(count: int) -> None:
+    if count > MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BULK_SIZE} items per request",
+        )
+
+
+async def validate_batch(adapter: TypeAdapter, raw: List[Any]):
+    """Validate a whole batch, reporting errors per index.
+
+    Returns ``(valid, errors)`` where ``valid`` is a list of
+    ``(index, model)`` pairs for the entries that passed. Large batches
+    are validated on the threadpool.
+    """
+    if len(raw) > INLINE_ITEMS:
+        return await run_in_threadpool(validate_batch_sync, adapter, raw)
+    return validate_batch_sync(adapter, raw)
+
+
+def validate_batch_sync(adapter: TypeAdapter, raw: List[Any]):
+    # One call for the whole batch; only a failing batch needs a second.
+    try:
+        return list(enumerate(adapter.validate_python(raw))), []
+    except ValidationError as exc:
+        failed = {}
+        for error in exc.errors(include_url=False):
+            index, *loc = error["loc"]
+            failed.setdefault(index, []).append(
+                {"loc": loc, "msg": error["msg"], "type": error["type"]}
+            )
+    errors = [{"index": index, "detail": detail} for index, detail in failed.items()]
+    # Re-validate the entries that passed so we get their models back.
+    indexes = [index for index in range(len(raw)) if index not in failed]
+    models = adapter.validate_python([raw[index] for index in indexes])
+    return list(zip(indexes, models)), errors
+
+
+async def collect_owned_items(entries, username: str, action: str):
+    """Look up a batch of ``(index, item_id)`` pairs with one repository call.
+
+    Returns ``(owned, errors)`` where ``owned`` holds ``(index, item)`` pairs
+    and ``errors`` reports the missing or foreign ids by request index.
+    """
+    with operation_latency.time("item_get_many"):
+        found = await storage.read(
+            items_db.get_many,
+            [item_id for _, item_id in entries],
+            large=len(entries) > INLINE_ITEMS,
+        )
+    owned, errors = [], []
+    for index, item_id in entries:
+        item = found.get(item_id)
+        if item is None:
+            errors.append({"index": index, "id": item_id, "detail": "Item not found"})
+        elif item["owner"] != username:
+            errors.append(
                 {
-                    "name": item_update.name,
-                    "description": item_update.description,
-                    "price": item_update.price,
+                    "index": index,
+                    "id": item_id,
+                    "detail": f"Not authorized to {action} this item",
                 }
             )
-            items_db[idx] = updated_item
-            return updated_item
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+        else:
+            owned.append((index, item))
+    return owned, errors
+
+
+@app.post("/items/bulk", response_model=BulkResult)
+async def create_items_bulk(
+    items: List[Any] = Body(...), current_user: User = Depends(get_current_user)
+):
+    check_bulk_size(len(items))
+    valid, errors = await validate_batch(item_list_adapter, items)
+    created_at = datetime.utcnow()
+    new_items = []
+    for _, item in valid:
+        new_item = item.model_dump()
+        new_item["owner"] = current_user.username
+        new_item["created_at"] = created_at
+        new_items.append(new_item)
+    created = await storage.write(
+        write_created,
+        current_user.username,
+        new_items,
+        large=len(new_items) > INLINE_ITEMS,
+    )
+    return TrustedJSONResponse({"items": created, "deleted": [], "errors": errors})
+
+
+@app.patch("/items/bulk", response_model=BulkResult)
+async def update_items_bulk(
+    patches: List[Any] = Body(...), current_user: User = Depends(get_current_user)
+):
+    check_bulk_size(len(patches))
+    valid, errors = await validate_batch(item_patch_list_adapter, patches)
+    patch_by_index = dict(valid)
+    owned, lookup_errors = await collect_owned_items(
+        [(index, patch.id) for index, patch in valid], current_user.username, "update"
+    )
+    # Patches for the same id apply in request order.
+    updated_by_id = {}
+    for index, item in owned:
+        updated_item = updated_by_id.get(item["id"], item).copy()
+        updated_item.update(patch_by_index[index].model_dump(exclude_unset=True))
+        updated_by_id[item["id"]] = updated_item
+    errors.extend(lookup_errors)
+    errors.sort(key=lambda error: error["index"])
+    updated_items = await storage.write(
+        write_updated_many,
+        current_user.username,
+        list(updated_by_id.values()),
+        large=len(updated_by_id) > INLINE_ITEMS,
+    )
+    return TrustedJSONResponse(
+        {"items": updated_items, "deleted": [], "errors": errors}
+    )
+
+
+@app.delete("/items/bulk", response_model=BulkResult)
+async def delete_items_bulk(
+    request: BulkDelete, current_user: User = Depends(get_current_user)
+):
+    check_bulk_size(len(request.ids))
+    owned, errors = await collect_owned_items(
+        list(enumerate(request.ids)), current_user.username, "delete"
+    )
+    # A repeated id is only deleted once.
+    deleted = list(dict.fromkeys(item["id"] for _, item in owned))
+    await storage.write(
+        write_deleted_many,
+        current_user.username,
+        deleted,
+        large=len(deleted) > INLINE_ITEMS,
+    )
+    return TrustedJSONResponse({"items": [], "deleted": deleted, "errors": errors})
+
+
+@app.get("/items/{item_id}", response_model=Item)
+async def get_item(
+    item_id: int, request: Request, current_user: User = Depends(get_current_user)
+):
+    # Check ownership and freshness from the version alone, so a 304 never
+    # loads or serializes the item.
+    with operation_latency.time("item_version"):
+        version = await storage.read(items_db.item_version, item_id)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
+        )
+    owner, item_version = version
+    if owner != current_user.username:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this item",
+        )
+    etag = make_etag(item_id, item_version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return TrustedJSONResponse(
+        await get_owned_item(item_id, current_user.username, "access"),
+        headers={"ETag": etag},
+    )
+
+
+@app.put("/items/{item_id}", response_model=Item)
+async def update_item(
+    item_id: int, item_update: Item, current_user: User = Depends(get_current_user)
+):
+    item = await get_owned_item(item_id, current_user.username, "update")
+    updated_item = item.copy()
+    updated_item.update(
+        {
+            "name": item_update.name,
+            "description": item_update.description,
+            "price": item_update.price,
+        }
+    )
+    try:
+        await storage.write(write_updated, current_user.username, updated_item)
+    except KeyError:
+        # Deleted by a concurrent request after we looked it up.
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
+        )
+    return TrustedJSONResponse(updated_item)
 
 
 @app.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_item(item_id: int, current_user: User = Depends(get_current_user)):
-    for idx, item in enumerate(items_db):
-        if item["id"] == item_id:
-            if item["owner"] != current_user.username:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Not authorized to delete this item",
-                )
-            items_db.pop(idx)
-            return
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+async def delete_item(item_id: int, current_user: User = Depends(get_current_user)):
+    await get_owned_item(item_id, current_user.username, "delete")
+    try:
+        await storage.write(write_deleted, current_user.username, item_id)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Item not found"
+        )
+
+
+@app.on_event("shutdown")
+def shutdown_hashing_pool():
+    hashing_pool.shutdown()
+
+
+@app.on_event("shutdown")
+def stop_compactor():
+    if compactor is not None:
+        compactor.stop()
+
+
+@app.on_event("shutdown")
+def close_durable_storage():
+    # A final snapshot makes the next startup skip journal replay.
+    if durable_storage is not None:
+        durable_storage.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+class RateLimit(NamedTuple):
+    rate: float  # tokens added per second
+    burst: int  # bucket capacity
+
+
+class TokenBucketLimiter:
+    """In-memory token buckets, one per key, with O(1) checks.
+
+    Buckets live in an LRU-ordered dict capped at ``max_buckets``. Only a
+    bucket that has refilled completely is evicted, since forgetting it is
+    the same as starting a new full one. Forgetting a bucket that is still
+    draining would hand its client a fresh burst, so when the least
+    recently used bucket has not refilled yet, requests from new clients
+    are refused until it has, rather than letting a flood of new keys
+    reset everyone's limits.
+
+    The limiter is meant to be used from the event loop thread only, so it
+    does no locking.
+    """
+
+    def __init__(
+        self, max_buckets: int = 100_000, clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_buckets = max_buckets
+        self._clock = clock
+        # Each bucket is [tokens, last update, time it will be full again].
+        self._buckets: "OrderedDict[Tuple[str, str], list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, scope: str, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        """Take one token from the bucket. Returns ``(allowed, retry_after)``."""
+        now = self._clock()
+        bucket_key = (scope, key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                oldest = next(iter(self._buckets.values()))
+                if oldest[2] > now:
+                    return False, oldest[2] - now
+                self._buckets.popitem(last=False)
+            bucket = [float(limit.burst), now, now]
+            self._buckets[bucket_key] = bucket
+        else:
+            self._buckets.move_to_end(bucket_key)
+            tokens = bucket[0] + (now - bucket[1]) * limit.rate
+            bucket[0] = tokens if tokens < limit.burst else float(limit.burst)
+            bucket[1] = now
+
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            bucket[2] = now + (limit.burst - bucket[0]) / limit.rate
+            return True, 0.0
+        return False, (1.0 - bucket[0]) / limit.rate
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a token bucket per route and per client.
+
+    ``rules`` maps a request path to its limit; other paths use ``default``
+    (or are not limited when it is None). Clients are identified by
+    ``key_func(scope)``, which should return a username when one is known,
+    and by client IP otherwise. For paths listed in ``body_username_paths``
+    the JSON body's ``username`` field is used instead, so login attempts are
+    counted per account. The body is buffered and replayed to the app.
+    ``body_username_key`` turns that field into the account's key, so every
+    spelling the app accepts for one account shares its bucket.
+
+    Paths in ``client_rules`` also get a bucket per client IP, checked
+    before the usual one. Without it a single client could try one
+    password against many accounts, each with a full bucket.
+    """
+
+    max_body_size = 4096
+
+    def __init__(
+        self,
+        app,
+        limiter: TokenBucketLimiter,
+        rules: Dict[str, RateLimit],
+        default: Optional[RateLimit] = None,
+        key_func: Optional[Callable[[dict], Optional[str]]] = None,
+        body_username_paths: Tuple[str, ...] = (),
+        body_username_key: Callable[[str], str] = str,
+        client_rules: Optional[Dict[str, RateLimit]] = None,
+    ):
+        self.app = app
+        self.limiter = limiter
+        self.rules = rules
+        self.default = default
+        self.key_func = key_func
+        self.body_username_paths = frozenset(body_username_paths)
+        self.body_username_key = body_username_key
+        self.client_rules = client_rules or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        limit = self.rules.get(path, self.default)
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        client = scope.get("client")
+        client_key = f"ip:{client[0] if client else 'unknown'}"
+        client_limit = self.client_rules.get(path)
+        if client_limit is not None:
+            allowed, retry_after = self.limiter.allow(
+                f"{path} per client", client_key, client_limit
+            )
+            if not allowed:
+                return await self._reject(send, retry_after)
+
+        key = None
+        if path in self.body_username_paths:
+            key, receive = await self._username_from_body(receive)
+            if key is not None:
+                key = f"user:{self.body_username_key(key)}"
+        if key is None and self.key_func is not None:
+            username = self.key_func(scope)
+            if username is not None:
+                key = f"user:{username}"
+        if key is None:
+            key = client_key
+
+        # Routes without their own rule share one bucket per client.
+        bucket_scope = path if path in self.rules else "*"
+        allowed, retry_after = self.limiter.allow(bucket_scope, key, limit)
+        if allowed:
+            return await self.app(scope, receive, send)
+        await self._reject(send, retry_after)
+
+    async def _username_from_body(
+        self, receive: Callable[[], Awaitable[dict]]
+    ) -> Tuple[Optional[str], Callable[[], Awaitable[dict]]]:
+        messages = []
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body") or len(body) > self.max_body_size:
+                break
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        username = None
+        if len(body) <= self.max_body_size:
+            try:
+                username = json.loads(body).get("username")
+            except (ValueError, AttributeError):
+                pass
+        if not isinstance(username, str):
+            username = None
+        return username, replay
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        body = b'{"detail":"Too many requests"}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,135 @@
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from journal import EPOCH, MICROSECOND
+
+# Item versions are stored in pages of 2 ** VERSION_PAGE_BITS ids.
+VERSION_PAGE_BITS = 10
+
+
+class ItemRecord:
+    """A stored item in compact form.
+
+    A dict per item costs a hash table plus a ``datetime`` object; this is
+    one slotted object with the owner string interned (shared by all of an
+    owner's items) and ``created_at`` held as integer microseconds since
+    the epoch. Items only become dicts again when they are read.
+    """
+
+    __slots__ = ("id", "owner", "name", "description", "price", "created_at")
+
+    def __init__(self, item: dict):
+        self.id: int = item["id"]
+        self.owner: str = sys.intern(item["owner"])
+        self.name: str = item["name"]
+        self.description: Optional[str] = item["description"]
+        self.price: float = item["price"]
+        created_at: Optional[datetime] = item["created_at"]
+        self.created_at: Optional[int] = (
+            None if created_at is None else (created_at - EPOCH) // MICROSECOND
+        )
+
+    def __getitem__(self, field: str):
+        # Lets the store read fields the same way from records and dicts.
+        # created_at reads as microseconds here.
+        return getattr(self, field)
+
+    def to_dict(self) -> dict:
+        created_at = self.created_at
+        return {
+            "id": self.id,
+            "owner": self.owner,
+            "name": self.name,
+            "description": self.description,
+            "price": self.price,
+            "created_at": (
+                None if created_at is None else EPOCH + created_at * MICROSECOND
+            ),
+        }
+
+
+class PriceKeys:
+    """A sorted chunk of ``(price, id)`` keys, held as two typed arrays.
+
+    A ``SortedList`` chunk for compact stores: 16 bytes a key instead of a
+    tuple and a list slot. Keys are rebuilt as tuples when read, so it
+    sorts, bisects and compares exactly like a list of tuples.
+    """
+
+    __slots__ = ("prices", "ids")
+
+    def __init__(self, keys: Iterable[Tuple[float, int]] = ()):
+        self.prices = array("d")
+        self.ids = array("q")
+        for price, item_id in keys:
+            self.prices.append(price)
+            self.ids.append(item_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Tuple[float, int]]:
+        return zip(self.prices, self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            keys = PriceKeys()
+            keys.prices = self.prices[index]
+            keys.ids = self.ids[index]
+            return keys
+        return self.prices[index], self.ids[index]
+
+    def __delitem__(self, index: int) -> None:
+        del self.prices[index]
+        del self.ids[index]
+
+    def insert(self, index: int, key: Tuple[float, int]) -> None:
+        self.prices.insert(index, key[0])
+        self.ids.insert(index, key[1])
+
+    def append(self, key: Tuple[float, int]) -> None:
+        self.prices.append(key[0])
+        self.ids.append(key[1])
+
+
+class VersionTable:
+    """Item versions in typed arrays indexed by id, for compact stores.
+
+    Ids come from one counter, so they are dense: 8 bytes an id instead of
+    a dict entry and an int object. Pages of ids are only allocated once
+    one of their ids is set. Supports the dict methods the store uses; 0
+    stands for no version, which store versions never are.
+    """
+
+    __slots__ = ("_pages",)
+
+    def __init__(self):
+        self._pages: Dict[int, array] = {}
+
+    def __setitem__(self, item_id: int, version: int) -> None:
+        number = item_id >> VERSION_PAGE_BITS
+        page = self._pages.get(number)
+        if page is None:
+            # setdefault, so two owners' writes cannot both add the page.
+            page = self._pages.setdefault(
+                number, array("q", bytes(8 << VERSION_PAGE_BITS))
+            )
+        page[item_id & ((1 << VERSION_PAGE_BITS) - 1)] = version
+
+    def get(self, item_id: int, default: Optional[int] = None) -> Optional[int]:
+        page = self._pages.get(item_id >> VERSION_PAGE_BITS)
+        if page is None:
+            return default
+        return page[item_id & ((1 << VERSION_PAGE_BITS) - 1)] or default
+
+    def pop(self, item_id: int, default: Optional[int] = None) -> Optional[int]:
+        version = self.get(item_id, default)
+        page = self._pages.get(item_id >> VERSION_PAGE_BITS)
+        if page is not None:
+            page[item_id & ((1 << VERSION_PAGE_BITS) - 1)] = 0
+        return version
+
+    def clear(self) -> None:
+        self._pages.clear()
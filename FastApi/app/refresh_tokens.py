@@ -0,0 +1,150 @@
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional, Set, Tuple
+
+
+class RefreshToken:
+    __slots__ = ("username", "family", "expires_at", "spent", "previous")
+
+    def __init__(
+        self, username: str, family: int, expires_at: float, previous: Optional[bytes]
+    ):
+        self.username = username
+        # Every token rotated from the same login shares a family.
+        self.family = family
+        self.expires_at = expires_at
+        # Set once the token has been exchanged for its successor.
+        self.spent = False
+        # The spent token this one replaced.
+        self.previous = previous
+
+
+class RefreshTokenStore:
+    """Bounded map of opaque refresh tokens, with rotation and revocation.
+
+    Tokens are random strings, stored only as their SHA-256 digest, so
+    renewing an access token is a hash and a dict lookup where logging in
+    again costs a bcrypt round. Each token can be exchanged once: ``rotate``
+    spends it and issues its successor. Presenting a spent token again
+    means it leaked, so its whole family is revoked, including the live
+    token the legitimate client holds.
+
+    Only the most recently spent token of a family is remembered for
+    that, so a session holds at most two entries however often it renews;
+    older tokens are simply unknown. Once ``maxsize`` tokens are held the
+    oldest are dropped, and their sessions have to log in again. The map
+    is per process: a token only works on the worker that issued it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        ttl: float = 7 * 24 * 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, RefreshToken]" = OrderedDict()
+        self._by_user: Dict[str, Set[bytes]] = {}
+        self._families = 0
+        self._lock = Lock()
+        self.rotations = 0
+        self.reuses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def issue(self, username: str) -> str:
+        """Start a new session for the user and return its first token."""
+        with self._lock:
+            self._families += 1
+            return self._issue(username, self._families, None)
+
+    def rotate(self, token: str) -> Optional[Tuple[str, str]]:
+        """Exchange a live token for ``(username, next_token)``, or return
+        None if it is unknown, expired, revoked or already spent."""
+        key = _digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                self._discard(key)
+                return None
+            if entry.spent:
+                self.reuses += 1
+                self._revoke_family(entry.username, entry.family)
+                return None
+            entry.spent = True
+            if entry.previous is not None:
+                self._discard(entry.previous)
+            self.rotations += 1
+            return entry.username, self._issue(entry.username, entry.family, key)
+
+    def revoke(self, token: str) -> bool:
+        """End the session the token belongs to. Returns False if the token
+        is unknown."""
+        key = _digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            self._revoke_family(entry.username, entry.family)
+            return True
+
+    def revoke_user(self, username: str) -> None:
+        with self._lock:
+            for key in self._by_user.pop(username, ()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self.rotations = 0
+            self.reuses = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "rotations": self.rotations,
+            "reuses": self.reuses,
+        }
+
+    def _issue(self, username: str, family: int, previous: Optional[bytes]) -> str:
+        # Called with the lock held.
+        token = secrets.token_urlsafe(32)
+        key = _digest(token)
+        self._entries[key] = RefreshToken(
+            username, family, self._clock() + self.ttl, previous
+        )
+        self._by_user.setdefault(username, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+        return token
+
+    def _revoke_family(self, username: str, family: int) -> None:
+        # Called with the lock held. A user has few sessions, so scanning
+        # theirs beats keeping a second index by family.
+        for key in list(self._by_user.get(username, ())):
+            if self._entries[key].family == family:
+                self._discard(key)
+
+    def _discard(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry.username)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry.username]
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
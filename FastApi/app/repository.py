@@ -0,0 +1,141 @@
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Iterable, List, Optional, Tuple
+
+
+class UserRepository(ABC):
+    """Storage for registered users, keyed by username and unique by email.
+
+    Emails are compared case-insensitively, after ``normalize_email``.
+    """
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[dict]:
+        """Return the user registered with ``email``, ignoring case."""
+
+    @abstractmethod
+    def add(self, user_data: dict) -> bool:
+        """Insert a new user. Returns False if the username or the email is
+        taken."""
+
+    @abstractmethod
+    def set_disabled(self, username: str, disabled: bool) -> None: ...
+
+    @abstractmethod
+    def set_hashed_password(self, username: str, hashed_password: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    def __contains__(self, username: str) -> bool:
+        return self.get(username) is not None
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+class ItemRepository(ABC):
+    """Storage for items, indexed by id and by owner."""
+
+    @abstractmethod
+    def get(self, item_id: int) -> Optional[dict]: ...
+
+    @abstractmethod
+    def owner_version(self, owner: str) -> int:
+        """A number that changes whenever any of the owner's items change."""
+
+    @abstractmethod
+    def item_version(self, item_id: int) -> Optional[Tuple[str, int]]:
+        """Return ``(owner, version)`` for an item without loading it."""
+
+    def get_many(self, item_ids: Iterable[int]) -> Dict[int, dict]:
+        """Return the items that exist among ``item_ids``, keyed by id."""
+        found = {}
+        for item_id in item_ids:
+            item = self.get(item_id)
+            if item is not None:
+                found[item_id] = item
+        return found
+
+    @abstractmethod
+    def create(self, item: dict) -> dict:
+        """Assign the item a new id, store it and return it."""
+
+    def create_many(self, items: List[dict]) -> List[dict]:
+        return [self.create(item) for item in items]
+
+    @abstractmethod
+    def replace(self, item: dict) -> dict: ...
+
+    def replace_many(self, items: List[dict]) -> List[dict]:
+        return [self.replace(item) for item in items]
+
+    @abstractmethod
+    def remove(self, item_id: int) -> dict: ...
+
+    def remove_many(self, item_ids: List[int]) -> None:
+        for item_id in item_ids:
+            self.remove(item_id)
+
+    def deferred_commit(self) -> ContextManager[None]:
+        """Context in which this thread's writes return once applied, and
+        only its exit waits for them to be durable. Stores that are durable
+        as soon as a write returns have nothing to defer."""
+        return nullcontext()
+
+    @abstractmethod
+    def page_by_owner(
+        self,
+        owner: str,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[dict]:
+        """Return up to ``limit`` of the owner's items with id > ``after``,
+        optionally only those priced within ``[min_price, max_price]``."""
+
+    @abstractmethod
+    def page_by_price(
+        self,
+        owner: str,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """Return up to ``limit`` of the owner's items priced within
+        ``[min_price, max_price]``, cheapest first with ties broken by id,
+        starting after the ``(price, id)`` key ``after``."""
+
+    @abstractmethod
+    def search(
+        self, owner: str, query: str, prefix: bool = False, limit: int = 20
+    ) -> List[dict]:
+        """Return the owner's items matching every term of ``query``, best
+        match first. With ``prefix``, each term also matches longer words."""
+
+    @abstractmethod
+    def stats(self, owner: str) -> dict:
+        """Return the owner's item count and the total, average, lowest and
+        highest price, from running aggregates rather than a scan."""
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+
+def empty_stats() -> dict:
+    return {
+        "count": 0,
+        "total_price": 0.0,
+        "average_price": None,
+        "min_price": None,
+        "max_price": None,
+    }
@@ -0,0 +1,173 @@
+import heapq
+import math
+import re
+import sys
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sorted_list import SortedList
+
+TOKEN_RE = re.compile(r"\w+")
+# Terms from the name count more than terms from the description.
+NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+# Upper bound on how many index terms one prefix may expand to.
+MAX_PREFIX_TERMS = 64
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+def item_terms(item: dict) -> Counter:
+    terms = Counter()
+    for term in tokenize(item.get("name")):
+        terms[sys.intern(term)] += NAME_WEIGHT
+    for term in tokenize(item.get("description")):
+        terms[sys.intern(term)] += DESCRIPTION_WEIGHT
+    return terms
+
+
+class InvertedIndex:
+    """Inverted index over one owner's item names and descriptions.
+
+    ``postings`` maps each term to ``{item_id: weighted term frequency}``,
+    and ``doc_terms`` each item to its terms. Terms are interned, so the
+    postings, the term list and every item share one string per term.
+    The terms are also kept in a ``SortedList`` so a prefix can be expanded
+    with a binary search. Adding, updating or removing an item only touches
+    that item's own terms, and ``add_many`` merges a batch's new terms into
+    the sorted list at once. A term whose last posting is removed stays in
+    the sorted list as a tombstone until ``compact`` rebuilds it.
+
+    Not thread-safe; callers serialize writes for an owner.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self.terms = SortedList()
+        self.dead_terms = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, item: dict) -> None:
+        self.add_many((item,))
+
+    def add_many(self, items: Iterable[dict]) -> None:
+        new_terms = []
+        for item in items:
+            item_id = item["id"]
+            if item_id in self.doc_terms:
+                self.remove(item_id)
+            terms = item_terms(item)
+            self.doc_terms[item_id] = tuple(terms)
+            for term, weight in terms.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = {}
+                    new_terms.append(term)
+                postings[item_id] = weight
+        if new_terms:
+            known = len(self.terms)
+            self.terms.update(new_terms)
+            # New terms the list already held were tombstones, now revived.
+            self.dead_terms -= len(new_terms) - (len(self.terms) - known)
+
+    def remove(self, item_id: int) -> None:
+        terms = self.doc_terms.pop(item_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            del postings[item_id]
+            if not postings:
+                del self.postings[term]
+                self.dead_terms += 1
+
+    def dead(self) -> List[str]:
+        """The dead terms in the sorted list. Unlike the other methods, this
+        only reads and can run while the index is being written to."""
+        return [term for term in self.terms if term not in self.postings]
+
+    def drop(self, terms: Iterable[str]) -> int:
+        """Drop those of ``terms`` that are still dead from the sorted list.
+        Returns how many."""
+        dropped = 0
+        for term in terms:
+            if term not in self.postings and self.terms.discard(term):
+                dropped += 1
+        self.dead_terms -= dropped
+        return dropped
+
+    def compact(self) -> int:
+        """Drop dead terms from the sorted list. Returns how many."""
+        return self.drop(self.dead()) if self.dead_terms else 0
+
+    def expand(self, term: str, prefix: bool) -> List[str]:
+        if not prefix:
+            return [term] if term in self.postings else []
+        matches = []
+        index = self.terms.bisect_left(term)
+        while index < len(self.terms) and len(matches) < MAX_PREFIX_TERMS:
+            candidate = self.terms[index]
+            if not candidate.startswith(term):
+                break
+            if candidate in self.postings:
+                matches.append(candidate)
+            index += 1
+        return matches
+
+    def search(
+        self, query: str, prefix: bool = False, limit: int = 20
+    ) -> List[Tuple[int, float]]:
+        """Return ``(item_id, score)`` for items matching every query term.
+
+        Scores are TF-IDF sums. Only the postings of the query terms are
+        read, and only the rarest term's postings are walked in full, so the
+        cost depends on how common the rarest term is, not on how many items
+        the owner has.
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+        total = len(self.doc_terms)
+        # For each query term, the postings of every index term it expands to.
+        per_term = []
+        for query_term in query_terms:
+            postings = [self.postings[term] for term in self.expand(query_term, prefix)]
+            if not postings:
+                return []
+            per_term.append(postings)
+
+        # Score the rarest term's items first, then only look those candidates
+        # up in the other terms' postings, so a common term costs no more than
+        # the candidate set.
+        per_term.sort(key=lambda postings: sum(map(len, postings)))
+        results: Dict[int, float] = {}
+        for postings in per_term[0]:
+            idf = math.log(1 + total / len(postings))
+            for item_id, weight in postings.items():
+                results[item_id] = results.get(item_id, 0.0) + weight * idf
+        for term_postings in per_term[1:]:
+            idfs = [math.log(1 + total / len(postings)) for postings in term_postings]
+            matched: Dict[int, float] = {}
+            for item_id, score in results.items():
+                extra = 0.0
+                found = False
+                for postings, idf in zip(term_postings, idfs):
+                    weight = postings.get(item_id)
+                    if weight is not None:
+                        extra += weight * idf
+                        found = True
+                if found:
+                    matched[item_id] = score + extra
+            results = matched
+            if not results:
+                return []
+        return heapq.nsmallest(
+            limit, results.items(), key=lambda entry: (-entry[1], entry[0])
+        )
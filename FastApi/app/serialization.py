@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, default=datetime.isoformat, separators=(",", ":")
+    ).encode()
+
+
+class TrustedJSONResponse(Response):
+    """JSON response for data the server built itself.
+
+    Returning a Response from an endpoint makes FastAPI skip the
+    ``response_model`` validation pass, so stored items go straight to bytes
+    instead of being turned back into models and then into JSON. Only use it
+    for content that already has the response model's shape.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
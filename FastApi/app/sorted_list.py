@@ -0,0 +1,211 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+from threading import Lock
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+# Chunks are split once they hold twice this many values.
+DEFAULT_LOAD = 1000
+
+
+class SortedList:
+    """A sorted list of distinct values, stored as a list of sorted chunks.
+
+    A plain sorted list shifts every value after the insertion point, so
+    filling it one value at a time is O(n^2). Here an insert only shifts
+    values within one chunk of at most ``2 * load`` values, after a binary
+    search over the chunk maxima, and a chunk that grows past that is
+    split in two. ``update`` merges a batch in one sort when it is large
+    next to the list.
+
+    Positions work as they do on a list (indexing, slicing, ``bisect_left``
+    and ``bisect_right``), by way of each chunk's starting position, which
+    is only recomputed on the first positional read after a write.
+
+    Every method holds the list's own lock, so like the list methods it
+    stands in for, each one is atomic and readers need no outside lock.
+
+    ``chunk`` builds a chunk from a list of values. Any sequence with
+    ``insert``, ``append``, item deletion and slicing will do, e.g. a typed
+    ``array`` to hold ints without an object per value.
+    """
+
+    def __init__(
+        self,
+        values: Iterable = (),
+        load: int = DEFAULT_LOAD,
+        chunk: Callable[[List[Any]], Any] = list,
+    ):
+        self._load = load
+        self._chunk = chunk
+        self._lock = Lock()
+        self._reset(sorted(set(values)))
+
+    def _reset(self, values: List[Any]) -> None:
+        # ``values`` is sorted and distinct.
+        load = self._load
+        self._chunks = [
+            self._chunk(values[i : i + load]) for i in range(0, len(values), load)
+        ]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(values)
+        self._offsets: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator:
+        # Iterates over a snapshot, so writes meanwhile cannot break it.
+        with self._lock:
+            return iter(list(chain.from_iterable(self._chunks)))
+
+    def __contains__(self, value: Any) -> bool:
+        with self._lock:
+            index = bisect_left(self._maxes, value)
+            if index == len(self._maxes):
+                return False
+            chunk = self._chunks[index]
+            return chunk[bisect_left(chunk, value)] == value
+
+    def __getitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self._len)
+                if step != 1:
+                    raise ValueError("SortedList slices cannot have a step")
+                return self._slice(start, stop)
+            if index < 0:
+                index += self._len
+            if not 0 <= index < self._len:
+                raise IndexError("SortedList index out of range")
+            chunk, position = self._position(index)
+            return self._chunks[chunk][position]
+
+    def __repr__(self) -> str:
+        return f"SortedList({list(self)!r})"
+
+    def add(self, value: Any) -> bool:
+        """Insert ``value`` unless it is already present. Returns whether
+        it was inserted."""
+        with self._lock:
+            maxes = self._maxes
+            if not maxes:
+                self._chunks.append(self._chunk([value]))
+                maxes.append(value)
+            else:
+                index = bisect_left(maxes, value)
+                if index == len(maxes):
+                    index -= 1
+                    chunk = self._chunks[index]
+                    chunk.append(value)
+                    maxes[index] = value
+                else:
+                    chunk = self._chunks[index]
+                    position = bisect_left(chunk, value)
+                    if chunk[position] == value:
+                        return False
+                    chunk.insert(position, value)
+                if len(chunk) > 2 * self._load:
+                    self._chunks[index : index + 1] = [
+                        chunk[: self._load],
+                        chunk[self._load :],
+                    ]
+                    maxes.insert(index, chunk[self._load - 1])
+            self._len += 1
+            self._offsets = None
+            return True
+
+    def update(self, values: Iterable) -> None:
+        """Insert every value not already present."""
+        values = list(values)
+        with self._lock:
+            if len(values) * 8 >= self._len:
+                # Cheaper to sort everything once than to insert one by one.
+                merged = chain(chain.from_iterable(self._chunks), values)
+                self._reset(sorted(set(merged)))
+                return
+        for value in values:
+            self.add(value)
+
+    def discard(self, value: Any) -> bool:
+        """Remove ``value`` if present. Returns whether it was."""
+        with self._lock:
+            index = bisect_left(self._maxes, value)
+            if index == len(self._maxes):
+                return False
+            chunk = self._chunks[index]
+            position = bisect_left(chunk, value)
+            if chunk[position] != value:
+                return False
+            self._delete(index, position)
+            return True
+
+    def pop(self, index: int = -1) -> Any:
+        with self._lock:
+            if index < 0:
+                index += self._len
+            if not 0 <= index < self._len:
+                raise IndexError("pop index out of range")
+            chunk, position = self._position(index)
+            value = self._chunks[chunk][position]
+            self._delete(chunk, position)
+            return value
+
+    def bisect_left(self, value: Any) -> int:
+        with self._lock:
+            index = bisect_left(self._maxes, value)
+            if index == len(self._maxes):
+                return self._len
+            return self._start(index) + bisect_left(self._chunks[index], value)
+
+    def bisect_right(self, value: Any) -> int:
+        with self._lock:
+            index = bisect_right(self._maxes, value)
+            if index == len(self._maxes):
+                return self._len
+            return self._start(index) + bisect_right(self._chunks[index], value)
+
+    def _delete(self, index: int, position: int) -> None:
+        chunk = self._chunks[index]
+        del chunk[position]
+        if not chunk:
+            del self._chunks[index]
+            del self._maxes[index]
+        else:
+            self._maxes[index] = chunk[-1]
+        self._len -= 1
+        self._offsets = None
+
+    def _starts(self) -> List[int]:
+        """Position of the first value of each chunk."""
+        if self._offsets is None:
+            self._offsets = list(accumulate(map(len, self._chunks), initial=0))
+        return self._offsets
+
+    def _start(self, index: int) -> int:
+        return 0 if index == 0 else self._starts()[index]
+
+    def _position(self, index: int):
+        """Chunk and position within it of the value at ``index``."""
+        chunks = self._chunks
+        if index < len(chunks[0]):
+            return 0, index
+        last = self._len - len(chunks[-1])
+        if index >= last:
+            return len(chunks) - 1, index - last
+        starts = self._starts()
+        chunk = bisect_right(starts, index) - 1
+        return chunk, index - starts[chunk]
+
+    def _slice(self, start: int, stop: int) -> List[Any]:
+        if start >= stop:
+            return []
+        chunk, position = self._position(start)
+        values = []
+        wanted = stop - start
+        while len(values) < wanted:
+            values.extend(
+                self._chunks[chunk][position : position + wanted - len(values)]
+            )
+            chunk += 1
+            position = 0
+        return values
@@ -0,0 +1,444 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from repository import ItemRepository, UserRepository, empty_stats, normalize_email
+from search import tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    full_name TEXT,
+    hashed_password TEXT NOT NULL,
+    disabled INTEGER NOT NULL DEFAULT 0,
+    email_key TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email_key);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    created_at TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS items_owner_id ON items (owner, id);
+CREATE INDEX IF NOT EXISTS items_owner_price ON items (owner, price, id);
+CREATE TABLE IF NOT EXISTS owner_versions (
+    owner TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5 (
+    name, description, content='items', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, name, description)
+    VALUES (new.id, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_update
+AFTER UPDATE OF name, description ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO items_fts (rowid, name, description)
+    VALUES (new.id, new.name, new.description);
+END;
+CREATE TABLE IF NOT EXISTS item_totals (
+    owner TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS item_totals_insert AFTER INSERT ON items BEGIN
+    INSERT INTO item_totals (owner, count, total) VALUES (new.owner, 1, new.price)
+    ON CONFLICT (owner) DO UPDATE
+    SET count = count + 1, total = total + excluded.total;
+END;
+CREATE TRIGGER IF NOT EXISTS item_totals_delete AFTER DELETE ON items BEGIN
+    UPDATE item_totals SET count = count - 1, total = total - old.price
+    WHERE owner = old.owner;
+END;
+CREATE TRIGGER IF NOT EXISTS item_totals_update AFTER UPDATE OF price ON items BEGIN
+    UPDATE item_totals SET total = total - old.price + new.price
+    WHERE owner = new.owner;
+END;
+"""
+
+USER_COLUMNS = "username, email, full_name, hashed_password, disabled"
+
+UPDATE_ITEM = (
+    "UPDATE items SET name = ?, description = ?, price = ?, version = version + 1"
+    " WHERE id = ? AND owner = ?"
+)
+
+BUMP_OWNER_VERSION = (
+    "INSERT INTO owner_versions (owner, version) VALUES (?, 1)"
+    " ON CONFLICT (owner) DO UPDATE SET version = version + 1"
+)
+
+ITEM_COLUMNS = "id, name, description, price, owner, created_at"
+QUALIFIED_ITEM_COLUMNS = ", ".join(
+    f"items.{column}" for column in ITEM_COLUMNS.split(", ")
+)
+# Same field weights as the in-memory index: name counts double.
+SEARCH_ITEMS = (
+    f"SELECT {QUALIFIED_ITEM_COLUMNS} FROM items_fts"
+    " JOIN items ON items.id = items_fts.rowid"
+    " WHERE items_fts MATCH ? AND items.owner = ?"
+    " ORDER BY bm25(items_fts, 2.0, 1.0), items.id LIMIT ?"
+)
+# Count and total come from item_totals; min and max are one index lookup
+# each in the (owner, price, id) index.
+ITEM_STATS = (
+    "SELECT count, total,"
+    " (SELECT MIN(price) FROM items WHERE owner = ?),"
+    " (SELECT MAX(price) FROM items WHERE owner = ?)"
+    " FROM item_totals WHERE owner = ?"
+)
+# Stay below SQLite's limit on the number of bound parameters.
+MAX_PARAMS = 900
+
+
+class SQLiteDatabase:
+    """A SQLite file shared by every thread and worker process.
+
+    Each thread gets its own connection, opened on first use, since sqlite3
+    connections must not be shared between threads. The database runs in
+    WAL mode so readers never block the single writer, which lets several
+    uvicorn workers use the same file.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Statements are reused from sqlite3's per-connection cache.
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _create_schema(self) -> None:
+        # One write transaction, so workers starting together create the
+        # schema once between them.
+        self.connection().executescript(f"BEGIN IMMEDIATE; {SCHEMA} COMMIT;")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def price_filter(
+    min_price: Optional[float], max_price: Optional[float]
+) -> Tuple[str, Tuple[float, ...]]:
+    where = ""
+    params: Tuple[float, ...] = ()
+    if min_price is not None:
+        where += " AND price >= ?"
+        params += (min_price,)
+    if max_price is not None:
+        where += " AND price <= ?"
+        params += (max_price,)
+    return where, params
+
+
+def row_to_item(row: sqlite3.Row) -> dict:
+    item = dict(row)
+    if item["created_at"] is not None:
+        item["created_at"] = datetime.fromisoformat(item["created_at"])
+    return item
+
+
+class SQLiteUserRepository(UserRepository):
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def get(self, username: str) -> Optional[dict]:
+        return self._fetch_one(
+            f"SELECT {USER_COLUMNS} FROM users WHERE username = ?", username
+        )
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        return self._fetch_one(
+            f"SELECT {USER_COLUMNS} FROM users WHERE email_key = ?",
+            normalize_email(email),
+        )
+
+    def add(self, user_data: dict) -> bool:
+        email_key = normalize_email(user_data["email"])
+        try:
+            self.db.connection().execute(
+                f"INSERT INTO users ({USER_COLUMNS}, email_key)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    user_data["username"],
+                    user_data["email"],
+                    user_data["full_name"],
+                    user_data["hashed_password"],
+                    int(user_data["disabled"]),
+                    email_key,
+                ),
+            )
+        except sqlite3.IntegrityError:
+            # The username or the email is taken.
+            return False
+        return True
+
+    def set_disabled(self, username: str, disabled: bool) -> None:
+        self.db.connection().execute(
+            "UPDATE users SET disabled = ? WHERE username = ?",
+            (int(disabled), username),
+        )
+
+    def set_hashed_password(self, username: str, hashed_password: str) -> None:
+        self.db.connection().execute(
+            "UPDATE users SET hashed_password = ? WHERE username = ?",
+            (hashed_password, username),
+        )
+
+    def clear(self) -> None:
+        self.db.connection().execute("DELETE FROM users")
+
+    def _fetch_one(self, query: str, key: str) -> Optional[dict]:
+        row = self.db.connection().execute(query, (key,)).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        user["disabled"] = bool(user["disabled"])
+        return user
+
+
+class SQLiteItemRepository(ItemRepository):
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def __len__(self) -> int:
+        return self.db.connection().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def get(self, item_id: int) -> Optional[dict]:
+        row = (
+            self.db.connection()
+            .execute(f"SELECT {ITEM_COLUMNS} FROM items WHERE id = ?", (item_id,))
+            .fetchone()
+        )
+        return None if row is None else row_to_item(row)
+
+    def owner_version(self, owner: str) -> int:
+        row = (
+            self.db.connection()
+            .execute("SELECT version FROM owner_versions WHERE owner = ?", (owner,))
+            .fetchone()
+        )
+        return 0 if row is None else row[0]
+
+    def item_version(self, item_id: int) -> Optional[Tuple[str, int]]:
+        row = (
+            self.db.connection()
+            .execute("SELECT owner, version FROM items WHERE id = ?", (item_id,))
+            .fetchone()
+        )
+        return None if row is None else (row[0], row[1])
+
+    def get_many(self, item_ids: Iterable[int]) -> Dict[int, dict]:
+        item_ids = list(item_ids)
+        conn = self.db.connection()
+        found = {}
+        for start in range(0, len(item_ids), MAX_PARAMS):
+            chunk = item_ids[start : start + MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT {ITEM_COLUMNS} FROM items WHERE id IN ({placeholders})", chunk
+            )
+            for row in rows:
+                found[row["id"]] = row_to_item(row)
+        return found
+
+    def create(self, item: dict) -> dict:
+        with self.db.transaction() as conn:
+            return self._insert(conn, item)
+
+    def create_many(self, items: List[dict]) -> List[dict]:
+        # One transaction means one WAL commit for the whole batch.
+        with self.db.transaction() as conn:
+            for item in items:
+                self._insert(conn, item)
+        return items
+
+    def _insert(self, conn: sqlite3.Connection, item: dict) -> dict:
+        created_at = item["created_at"]
+        cursor = conn.execute(
+            "INSERT INTO items (owner, name, description, price, created_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                item["owner"],
+                item["name"],
+                item["description"],
+                item["price"],
+                None if created_at is None else created_at.isoformat(),
+            ),
+        )
+        item["id"] = cursor.lastrowid
+        conn.execute(BUMP_OWNER_VERSION, (item["owner"],))
+        return item
+
+    def replace(self, item: dict) -> dict:
+        with self.db.transaction() as conn:
+            cursor = conn.execute(UPDATE_ITEM, self._update_params(item))
+            if cursor.rowcount == 0:
+                raise KeyError(item["id"])
+            conn.execute(BUMP_OWNER_VERSION, (item["owner"],))
+        return item
+
+    def replace_many(self, items: List[dict]) -> List[dict]:
+        # Items deleted by a concurrent request are skipped, like ItemStore.
+        replaced = []
+        with self.db.transaction() as conn:
+            for item in items:
+                cursor = conn.execute(UPDATE_ITEM, self._update_params(item))
+                if cursor.rowcount:
+                    replaced.append(item)
+            owners = {item["owner"] for item in replaced}
+            conn.executemany(BUMP_OWNER_VERSION, [(owner,) for owner in owners])
+        return replaced
+
+    @staticmethod
+    def _update_params(item: dict) -> tuple:
+        return (
+            item["name"],
+            item["description"],
+            item["price"],
+            item["id"],
+            item["owner"],
+        )
+
+    def remove(self, item_id: int) -> dict:
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                f"DELETE FROM items WHERE id = ? RETURNING {ITEM_COLUMNS}", (item_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(item_id)
+            conn.execute(BUMP_OWNER_VERSION, (row["owner"],))
+        return row_to_item(row)
+
+    def remove_many(self, item_ids: List[int]) -> None:
+        with self.db.transaction() as conn:
+            owners = set()
+            for item_id in item_ids:
+                row = conn.execute(
+                    "DELETE FROM items WHERE id = ? RETURNING owner", (item_id,)
+                ).fetchone()
+                if row is not None:
+                    owners.add(row[0])
+            conn.executemany(BUMP_OWNER_VERSION, [(owner,) for owner in owners])
+
+    def page_by_owner(
+        self,
+        owner: str,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[dict]:
+        # Both bounds go through the (owner, id) index; -1 means no limit.
+        where, params = price_filter(min_price, max_price)
+        rows = self.db.connection().execute(
+            f"SELECT {ITEM_COLUMNS} FROM items WHERE owner = ? AND id > ?{where}"
+            " ORDER BY id LIMIT ?",
+            (
+                owner,
+                -1 if after is None else after,
+                *params,
+                -1 if limit is None else limit,
+            ),
+        )
+        return [row_to_item(row) for row in rows]
+
+    def page_by_price(
+        self,
+        owner: str,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        # Served in order from the (owner, price, id) index.
+        where, params = price_filter(min_price, max_price)
+        if after is not None:
+            where += " AND (price, id) > (?, ?)"
+            params += after
+        rows = self.db.connection().execute(
+            f"SELECT {ITEM_COLUMNS} FROM items WHERE owner = ?{where}"
+            " ORDER BY price, id LIMIT ?",
+            (owner, *params, -1 if limit is None else limit),
+        )
+        return [row_to_item(row) for row in rows]
+
+    def search(
+        self, owner: str, query: str, prefix: bool = False, limit: int = 20
+    ) -> List[dict]:
+        # Quote each term so user input can't use FTS5 query syntax.
+        suffix = "*" if prefix else ""
+        match = " ".join(f'"{term}"{suffix}' for term in tokenize(query))
+        if not match:
+            return []
+        rows = self.db.connection().execute(SEARCH_ITEMS, (match, owner, limit))
+        return [row_to_item(row) for row in rows]
+
+    def stats(self, owner: str) -> dict:
+        row = self.db.connection().execute(ITEM_STATS, (owner, owner, owner)).fetchone()
+        if row is None or not row[0]:
+            return empty_stats()
+        count, total, min_price, max_price = row
+        return {
+            "count": count,
+            "total_price": total,
+            "average_price": total / count,
+            "min_price": min_price,
+            "max_price": max_price,
+        }
+
+    def clear(self) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM items")
+            # Versions go on from where they were rather than restarting at
+            # 1, which would hand out ETags clients already hold.
+            conn.execute("UPDATE owner_versions SET version = version + 1")
+            conn.execute("DELETE FROM item_totals")
@@ -0,0 +1,760 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from journal import (
+    ITEM_DELETE,
+    ITEM_PUT,
+    ITEMS_CLEAR,
+    USER_DISABLED,
+    USER_PUT,
+    USERS_CLEAR,
+    Journal,
+    item_to_row,
+)
+from records import ItemRecord, PriceKeys, VersionTable
+from repository import ItemRepository, UserRepository, empty_stats, normalize_email
+from search import InvertedIndex
+from sorted_list import SortedList
+
+logger = logging.getLogger(__name__)
+
+# How many dead index entries compaction drops per hold of an owner's lock.
+COMPACT_BATCH = 256
+
+
+class Journaled:
+    """Mixin for stores whose writes can be appended to a ``Journal``.
+
+    Records are appended while the write's lock is held, so writes to the
+    same data reach the journal in the order they were applied. Waiting
+    for the record to be durable happens after the lock is released, or
+    for writes made in ``deferred_commit``, once the caller's own locks
+    are released too.
+    """
+
+    journal: Optional[Journal] = None
+    # Per thread rather than per store: the stores share one journal, so
+    # a deferred wait covers the writes of either.
+    _deferred = threading.local()
+
+    def _log(self, *record) -> int:
+        if self.journal is None:
+            return 0
+        return self.journal.append(record)
+
+    def _commit(self, seq: int) -> None:
+        if not seq:
+            return
+        pending = getattr(self._deferred, "seq", None)
+        if pending is not None:
+            self._deferred.seq = max(pending, seq)
+        else:
+            self.journal.wait(seq)
+
+    @contextmanager
+    def deferred_commit(self) -> Iterator[None]:
+        outer = getattr(self._deferred, "seq", None)
+        self._deferred.seq = 0
+        try:
+            yield
+            seq = self._deferred.seq
+        finally:
+            self._deferred.seq = outer
+        if outer is not None:
+            self._deferred.seq = max(outer, seq)
+        elif seq:
+            # Waiting for the last record covers every one before it.
+            self.journal.wait(seq)
+
+
+class UserStore(Journaled, UserRepository):
+    """In-memory user storage backed by a plain dict, with a second dict
+    from normalized email to username."""
+
+    def __init__(self):
+        self._users: Dict[str, dict] = {}
+        self._by_email: Dict[str, str] = {}
+        self._lock = Lock()
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(list(self._users.values()))
+
+    def get(self, username: str) -> Optional[dict]:
+        return self._users.get(username)
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        username = self._by_email.get(normalize_email(email))
+        return None if username is None else self._users.get(username)
+
+    def add(self, user_data: dict) -> bool:
+        email = normalize_email(user_data["email"])
+        with self._lock:
+            if user_data["username"] in self._users or email in self._by_email:
+                return False
+            self._users[user_data["username"]] = user_data
+            self._by_email[email] = user_data["username"]
+            seq = self._log(USER_PUT, user_data)
+        self._commit(seq)
+        return True
+
+    def restore(self, user_data: dict) -> None:
+        """Store a user as-is, replacing any existing one. Not journaled."""
+        previous = self._users.get(user_data["username"])
+        if previous is not None:
+            self._by_email.pop(normalize_email(previous["email"]), None)
+        self._users[user_data["username"]] = user_data
+        self._by_email[normalize_email(user_data["email"])] = user_data["username"]
+
+    def set_disabled(self, username: str, disabled: bool) -> None:
+        with self._lock:
+            self._users[username]["disabled"] = disabled
+            seq = self._log(USER_DISABLED, username, disabled)
+        self._commit(seq)
+
+    def set_hashed_password(self, username: str, hashed_password: str) -> None:
+        with self._lock:
+            user_data = dict(self._users[username], hashed_password=hashed_password)
+            self._users[username] = user_data
+            seq = self._log(USER_PUT, user_data)
+        self._commit(seq)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._by_email.clear()
+            seq = self._log(USERS_CLEAR)
+        self._commit(seq)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._users
+
+
+class IdAllocator:
+    """Thread-safe, monotonic id source. Ids are never handed out twice."""
+
+    def __init__(self, last_id: int = 0):
+        self._last_id = last_id
+        self._lock = Lock()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def reserve(self, count: int = 1) -> int:
+        """Reserve ``count`` consecutive ids and return the first one."""
+        with self._lock:
+            first_id = self._last_id + 1
+            self._last_id += count
+            return first_id
+
+    def observe(self, item_id: int) -> None:
+        """Make sure ``item_id`` is never allocated again."""
+        with self._lock:
+            if item_id > self._last_id:
+                self._last_id = item_id
+
+    def reset(self) -> None:
+        with self._lock:
+            self._last_id = 0
+
+
+class PriceTotals:
+    """Running count and price total of one owner's items."""
+
+    __slots__ = ("count", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, price: float) -> None:
+        self.count += 1
+        self.total += price
+
+    def discard(self, price: float) -> None:
+        self.count -= 1
+        # Reset rather than keep the rounding error of the last subtraction.
+        self.total = self.total - price if self.count else 0.0
+
+
+class ItemStore(Journaled, ItemRepository):
+    """In-memory item storage with a primary id index and an owner index.
+
+    Items are kept in a dict keyed by id, so point lookups are O(1). Each
+    owner also gets a ``SortedList`` of the ids they own, so listing one
+    user's items only touches their own items instead of scanning all of
+    them.
+
+    Writes lock only the shard their owner hashes to, so writes for
+    different users rarely wait on each other. Single dict operations are
+    atomic in CPython, which is what lets reads go without a lock.
+
+    Each owner also has an inverted index over item names and descriptions
+    and a ``SortedList`` of ``(price, id)`` keys, both kept up to date by
+    every write. Price range queries bisect into the price list, so they
+    cost O(log n + k) for k results. A batch insert merges its keys into
+    the lists in one go.
+
+    Every write also stamps the item and its owner with a version taken
+    from one increasing sequence. The sequence starts at the current time
+    in nanoseconds, so versions from before a restart are never reused.
+
+    Deleting an item leaves its entries in the owner's id and price lists
+    behind as tombstones, so a delete is O(1) instead of shifting the
+    lists. Reads skip tombstones, and ``compact`` (run in the background
+    by ``Compactor``) drops them from an owner's lists once enough of them
+    pile up.
+
+    With a ``journal`` attached, every write is appended to it and waits
+    until it is durable before returning. Batch writes wait only once.
+
+    With ``compact_items``, items are held as ``ItemRecord`` objects rather
+    than dicts, which takes far less memory per item; reads turn them back
+    into dicts. The indexes then hold ids, prices and item versions in
+    typed arrays rather than as Python objects.
+    """
+
+    def __init__(self, shards: int = 64, compact_items: bool = False):
+        self.compact_items = compact_items
+        # Item dicts, or ItemRecords with compact_items.
+        self._items: Dict[int, Any] = {}
+        self._owner_ids: Dict[str, SortedList] = {}
+        self._item_versions: Any = VersionTable() if compact_items else {}
+        self._owner_versions: Dict[str, int] = {}
+        self._search: Dict[str, InvertedIndex] = {}
+        # (price, id) keys.
+        self._prices: Dict[str, SortedList] = {}
+        self._tombstones: Dict[str, int] = {}
+        self._totals: Dict[str, PriceTotals] = {}
+        self._versions = itertools.count(time.time_ns())
+        self._ids = IdAllocator()
+        self._locks = [Lock() for _ in range(shards)]
+        # How the id and price lists store their chunks.
+        self._id_chunk = partial(array, "q") if compact_items else list
+        self._price_chunk = PriceKeys if compact_items else list
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._items
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._unpacked_all(list(self._items.values())))
+
+    @property
+    def last_id(self) -> int:
+        return self._ids.last_id
+
+    @property
+    def tombstones(self) -> int:
+        return sum(self._tombstones.values())
+
+    def _lock_for(self, owner: str) -> Lock:
+        return self._locks[hash(owner) % len(self._locks)]
+
+    def get(self, item_id: int) -> Optional[dict]:
+        item = self._items.get(item_id)
+        return None if item is None else self._unpacked(item)
+
+    def owner_version(self, owner: str) -> int:
+        return self._owner_versions.get(owner, 0)
+
+    def item_version(self, item_id: int) -> Optional[Tuple[str, int]]:
+        item = self._items.get(item_id)
+        if item is None:
+            return None
+        return item["owner"], self._item_versions.get(item_id, 0)
+
+    def _bump(self, owner: str, item_id: Optional[int] = None) -> None:
+        # Called with the owner's lock held.
+        version = next(self._versions)
+        self._owner_versions[owner] = version
+        if item_id is not None:
+            self._item_versions[item_id] = version
+
+    def create(self, item: dict) -> dict:
+        item["id"] = self._ids.reserve()
+        self._commit(self._insert(item))
+        return item
+
+    def create_many(self, items: List[dict]) -> List[dict]:
+        # Reserve one contiguous block of ids for the whole batch.
+        first_id = self._ids.reserve(len(items))
+        by_owner: Dict[str, List[dict]] = {}
+        for offset, item in enumerate(items):
+            item["id"] = first_id + offset
+            by_owner.setdefault(item["owner"], []).append(item)
+        seq = 0
+        for owner, owned in by_owner.items():
+            seq = self._insert_new(owner, owned)
+        self._commit(seq)
+        return items
+
+    def add(self, item: dict) -> dict:
+        """Store an item that already has an id, e.g. when restoring data."""
+        self._ids.observe(item["id"])
+        self._commit(self._insert(item))
+        return item
+
+    def load(self, items: List[dict], last_id: int = 0) -> None:
+        """Bulk-load items into an empty store, building each owner's
+        indexes once instead of one insert at a time. Not journaled."""
+        by_owner: Dict[str, List[dict]] = {}
+        for item in items:
+            by_owner.setdefault(item["owner"], []).append(item)
+            self._items[item["id"]] = self._packed(item)
+        for owner, owned in by_owner.items():
+            with self._lock_for(owner):
+                self._owner_ids[owner] = SortedList(
+                    (item["id"] for item in owned), chunk=self._id_chunk
+                )
+                self._prices[owner] = SortedList(
+                    ((item["price"], item["id"]) for item in owned),
+                    chunk=self._price_chunk,
+                )
+                totals = self._totals[owner] = PriceTotals()
+                index = self._search[owner] = InvertedIndex()
+                index.add_many(owned)
+                for item in owned:
+                    totals.add(item["price"])
+                    self._bump(owner, item["id"])
+        self._ids.observe(max(last_id, max(self._items, default=0)))
+
+    def _insert(self, item: dict) -> int:
+        item_id = item["id"]
+        with self._lock_for(item["owner"]):
+            if item_id in self._items:
+                raise KeyError(f"Item {item_id} already exists")
+            self._items[item_id] = self._packed(item)
+            if not self._id_list(item["owner"]).add(item_id):
+                # Re-adding a deleted id revives its tombstone.
+                self._tombstones[item["owner"]] -= 1
+            self._price_list(item["owner"]).add((item["price"], item_id))
+            self._totals.setdefault(item["owner"], PriceTotals()).add(item["price"])
+            self._search.setdefault(item["owner"], InvertedIndex()).add(item)
+            self._bump(item["owner"], item_id)
+            return self._log(ITEM_PUT, item_to_row(item))
+
+    def _id_list(self, owner: str) -> SortedList:
+        # Called with the owner's lock held.
+        ids = self._owner_ids.get(owner)
+        if ids is None:
+            ids = self._owner_ids[owner] = SortedList(chunk=self._id_chunk)
+        return ids
+
+    def _price_list(self, owner: str) -> SortedList:
+        # Called with the owner's lock held.
+        prices = self._prices.get(owner)
+        if prices is None:
+            prices = self._prices[owner] = SortedList(chunk=self._price_chunk)
+        return prices
+
+    def _insert_new(self, owner: str, items: List[dict]) -> int:
+        """Insert one owner's items under ids no item has had, merging
+        their keys into the owner's id and price lists at once."""
+        packed = [self._packed(item) for item in items]
+        with self._lock_for(owner):
+            for item, stored in zip(items, packed):
+                self._items[item["id"]] = stored
+            self._id_list(owner).update(item["id"] for item in items)
+            self._price_list(owner).update(
+                (item["price"], item["id"]) for item in items
+            )
+            totals = self._totals.setdefault(owner, PriceTotals())
+            self._search.setdefault(owner, InvertedIndex()).add_many(items)
+            seq = 0
+            for item in items:
+                totals.add(item["price"])
+                self._bump(owner, item["id"])
+                seq = self._log(ITEM_PUT, item_to_row(item))
+            return seq
+
+    def replace(self, item: dict) -> dict:
+        self._commit(self._replace(item))
+        return item
+
+    def _replace(self, item: dict) -> int:
+        # Owner never changes on update, so the owner index stays valid.
+        with self._lock_for(item["owner"]):
+            old = self._items[item["id"]]
+            if old["owner"] != item["owner"]:
+                raise ValueError("Item owner cannot change")
+            # Packing the item and placing its new price key are what a bad
+            # item fails on, so they come before anything else changes.
+            packed = self._packed(item)
+            if old["price"] != item["price"]:
+                prices = self._prices[item["owner"]]
+                prices.add((item["price"], item["id"]))
+                prices.discard((old["price"], item["id"]))
+                totals = self._totals[item["owner"]]
+                totals.total += item["price"] - old["price"]
+            self._items[item["id"]] = packed
+            if (old["name"], old["description"]) != (item["name"], item["description"]):
+                self._search[item["owner"]].add(item)
+            self._bump(item["owner"], item["id"])
+            return self._log(ITEM_PUT, item_to_row(item))
+
+    def replace_many(self, items: List[dict]) -> List[dict]:
+        replaced = []
+        seq = 0
+        for item in items:
+            try:
+                seq = self._replace(item)
+            except KeyError:
+                # Deleted by a concurrent request; nothing left to update.
+                continue
+            replaced.append(item)
+        self._commit(seq)
+        return replaced
+
+    def remove(self, item_id: int) -> dict:
+        owner = self._items[item_id]["owner"]
+        with self._lock_for(owner):
+            item = self._items.pop(item_id)
+            self._item_versions.pop(item_id, None)
+            self._search[owner].remove(item_id)
+            self._totals[owner].discard(item["price"])
+            # The id and price entries stay behind as tombstones.
+            self._tombstones[owner] = self._tombstones.get(owner, 0) + 1
+            self._bump(owner)
+            seq = self._log(ITEM_DELETE, (item_id,))
+        self._commit(seq)
+        return self._unpacked(item)
+
+    def remove_many(self, item_ids: List[int]) -> None:
+        ids_by_owner: Dict[str, set] = {}
+        for item_id in item_ids:
+            item = self._items.get(item_id)
+            if item is not None:
+                ids_by_owner.setdefault(item["owner"], set()).add(item_id)
+        seq = 0
+        for owner, removed in ids_by_owner.items():
+            with self._lock_for(owner):
+                index = self._search.get(owner)
+                count = 0
+                totals = self._totals[owner]
+                for item_id in removed:
+                    item = self._items.pop(item_id, None)
+                    if item is None:
+                        continue
+                    totals.discard(item["price"])
+                    count += 1
+                    self._item_versions.pop(item_id, None)
+                    if index is not None:
+                        index.remove(item_id)
+                self._tombstones[owner] = self._tombstones.get(owner, 0) + count
+                self._bump(owner)
+                seq = self._log(ITEM_DELETE, tuple(removed))
+        self._commit(seq)
+
+    def compact(self, threshold: float = 0.0, min_tombstones: int = 1) -> int:
+        """Drop the tombstones of every owner with at least
+        ``min_tombstones`` of them making up at least ``threshold`` of their
+        id list, and likewise the dead terms of their search index. Returns
+        how many were dropped.
+
+        Dead entries are found without the owner's lock, then dropped
+        ``COMPACT_BATCH`` at a time, each checked again under the lock, so
+        a write waits for one batch at most rather than a whole owner.
+        """
+        dropped = 0
+        for owner, count in list(self._tombstones.items()):
+            ids = self._owner_ids.get(owner)
+            if ids is None or count < min_tombstones or count < threshold * len(ids):
+                continue
+            prices = self._prices.get(owner, SortedList())
+            dead_ids = [item_id for item_id in ids if item_id not in self._items]
+            dead_keys = [key for key in prices if self._priced_item(key) is None]
+            lock = self._lock_for(owner)
+            for start in range(0, max(len(dead_ids), len(dead_keys)), COMPACT_BATCH):
+                with lock:
+                    if self._owner_ids.get(owner) is not ids:
+                        break  # Cleared meanwhile.
+                    removed = 0
+                    for item_id in dead_ids[start : start + COMPACT_BATCH]:
+                        if item_id not in self._items and ids.discard(item_id):
+                            removed += 1
+                    for key in dead_keys[start : start + COMPACT_BATCH]:
+                        if self._priced_item(key) is None:
+                            prices.discard(key)
+                    self._tombstones[owner] -= removed
+                    dropped += removed
+            with lock:
+                if self._owner_ids.get(owner) is ids and not ids:
+                    del self._owner_ids[owner]
+                    self._prices.pop(owner, None)
+                    self._totals.pop(owner, None)
+                if self._tombstones.get(owner) == 0:
+                    del self._tombstones[owner]
+        for owner, index in list(self._search.items()):
+            dead = index.dead_terms
+            if dead < min_tombstones or dead < threshold * len(index.terms):
+                continue
+            dead_terms = index.dead()
+            lock = self._lock_for(owner)
+            for start in range(0, len(dead_terms), COMPACT_BATCH):
+                with lock:
+                    dropped += index.drop(dead_terms[start : start + COMPACT_BATCH])
+        return dropped
+
+    def page_by_owner(
+        self,
+        owner: str,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[dict]:
+        """Return up to ``limit`` of the owner's items with id > ``after``."""
+        ids = self._owner_ids.get(owner)
+        if not ids:
+            return []
+        start = 0 if after is None else ids.bisect_right(after)
+        if min_price is None and max_price is None:
+            return self._unpacked_all(
+                self._scan(ids, start, None, limit, self._items.get)
+            )
+        prices = self._prices.get(owner, SortedList())
+        low, high = self._price_bounds(prices, min_price, max_price)
+        if low >= high:
+            # No key in range, e.g. min_price > max_price. Without this the
+            # negative width would still pass the check below and walk all
+            # of the owner's ids.
+            return []
+        if limit is not None and limit * len(ids) < (high - low) ** 2:
+            # The range holds a good share of the owner's m of n items, so
+            # walking the ids in order fills the page after about
+            # limit * n / m reads, which is less than reading the range.
+            floor = -math.inf if min_price is None else min_price
+            ceiling = math.inf if max_price is None else max_price
+
+            def lookup(item_id: int) -> Optional[Any]:
+                item = self._items.get(item_id)
+                if item is None or not floor <= item["price"] <= ceiling:
+                    return None
+                return item
+
+            return self._unpacked_all(self._scan(ids, start, None, limit, lookup))
+        # A narrow range: keep the ``limit`` smallest ids past ``after`` in
+        # a heap, O(m log limit) rather than sorting the range every page.
+        candidates = (
+            key[1]
+            for key in prices[low:high]
+            if (after is None or key[1] > after) and self._priced_item(key) is not None
+        )
+        if limit is None:
+            page_ids = sorted(candidates)
+        else:
+            page_ids = heapq.nsmallest(limit, candidates)
+        stored = (self._items.get(item_id) for item_id in page_ids)
+        return self._unpacked_all([item for item in stored if item is not None])
+
+    def page_by_price(
+        self,
+        owner: str,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        prices = self._prices.get(owner)
+        if not prices:
+            return []
+        start = self._price_start(prices, min_price, after)
+        # (price, inf) sorts after every (price, id).
+        bound = None if max_price is None else (max_price, math.inf)
+        return self._unpacked_all(
+            self._scan(prices, start, bound, limit, self._priced_item)
+        )
+
+    @classmethod
+    def _price_bounds(
+        cls,
+        prices: SortedList,
+        min_price: Optional[float],
+        max_price: Optional[float],
+    ) -> Tuple[int, int]:
+        """Return the slice of ``prices`` between the two prices."""
+        start = cls._price_start(prices, min_price)
+        stop = len(prices)
+        if max_price is not None:
+            stop = prices.bisect_right((max_price, math.inf))
+        return start, stop
+
+    @staticmethod
+    def _price_start(
+        prices: SortedList,
+        min_price: Optional[float],
+        after: Optional[Tuple[float, int]] = None,
+    ) -> int:
+        # (price,) sorts before every (price, id).
+        start = 0 if min_price is None else prices.bisect_left((min_price,))
+        if after is not None:
+            start = max(start, prices.bisect_right(after))
+        return start
+
+    def _packed(self, item: dict) -> Any:
+        return ItemRecord(item) if self.compact_items else item
+
+    def _unpacked(self, stored: Any) -> dict:
+        return stored.to_dict() if self.compact_items else stored
+
+    def _unpacked_all(self, stored: List[Any]) -> List[dict]:
+        if not self.compact_items:
+            return stored
+        return [record.to_dict() for record in stored]
+
+    def _priced_item(self, key: Tuple[float, int]) -> Optional[Any]:
+        # A price key is live if its item exists and still has that price.
+        item = self._items.get(key[1])
+        if item is None or item["price"] != key[0]:
+            return None
+        return item
+
+    @staticmethod
+    def _scan(
+        entries: SortedList,
+        start: int,
+        bound: Optional[tuple],
+        limit: Optional[int],
+        lookup: Callable[[Any], Optional[Any]],
+    ) -> List[Any]:
+        """Collect up to ``limit`` live stored items from the sorted ``entries``,
+        starting at ``start`` and stopping past ``bound``.
+
+        Tombstones are skipped, so this reads more than ``limit`` entries
+        when there are some. Each further chunk starts after the last entry
+        seen rather than at a fixed index, so entries inserted meanwhile
+        cannot shift the position.
+        """
+        page = []
+        while True:
+            wanted = None if limit is None else limit - len(page)
+            chunk = (
+                entries[start:] if wanted is None else entries[start : start + wanted]
+            )
+            for entry in chunk:
+                if bound is not None and entry > bound:
+                    return page
+                item = lookup(entry)
+                if item is not None:
+                    page.append(item)
+            if wanted is None or len(page) >= limit or len(chunk) < wanted:
+                return page
+            start = entries.bisect_right(chunk[-1])
+
+    def search(
+        self, owner: str, query: str, prefix: bool = False, limit: int = 20
+    ) -> List[dict]:
+        index = self._search.get(owner)
+        if index is None:
+            return []
+        # The index is only consistent under the owner's lock.
+        with self._lock_for(owner):
+            ranked = index.search(query, prefix=prefix, limit=limit)
+            return self._unpacked_all([self._items[item_id] for item_id, _ in ranked])
+
+    def stats(self, owner: str) -> dict:
+        with self._lock_for(owner):
+            totals = self._totals.get(owner)
+            if totals is None or not totals.count:
+                return empty_stats()
+            # Drop tombstones at either end of the price list. Each is
+            # dropped once, so the cost is amortized O(1). Both loops stop
+            # once the list is empty, so an index out of step with the totals
+            # reports no min and max rather than failing.
+            prices = self._prices.get(owner, SortedList())
+            while prices and self._priced_item(prices[0]) is None:
+                prices.pop(0)
+            while prices and self._priced_item(prices[-1]) is None:
+                prices.pop()
+            return {
+                "count": totals.count,
+                "total_price": totals.total,
+                "average_price": totals.total / totals.count,
+                "min_price": prices[0][0] if prices else None,
+                "max_price": prices[-1][0] if prices else None,
+            }
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._search.clear()
+        self._prices.clear()
+        self._tombstones.clear()
+        self._totals.clear()
+        self._owner_ids.clear()
+        self._item_versions.clear()
+        self._owner_versions.clear()
+        self._ids.reset()
+        self._commit(self._log(ITEMS_CLEAR))
+
+
+class Compactor:
+    """Background thread dropping an ``ItemStore``'s tombstones.
+
+    Every ``interval`` seconds it compacts the owners with at least
+    ``min_tombstones`` tombstones making up at least ``threshold`` of their
+    index, so each owner's rebuild is paid for by the deletes before it.
+    """
+
+    def __init__(
+        self,
+        items: ItemStore,
+        threshold: float = 0.25,
+        min_tombstones: int = 64,
+        interval: float = 1.0,
+    ):
+        self.items = items
+        self.threshold = threshold
+        self.min_tombstones = min_tombstones
+        self.interval = interval
+        self.runs = 0
+        self.removed = 0
+        self.last_duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="item-compaction", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run_once(self) -> int:
+        start = time.perf_counter()
+        removed = self.items.compact(self.threshold, self.min_tombstones)
+        self.last_duration = time.perf_counter() - start
+        self.runs += 1
+        self.removed += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "tombstones": self.items.tombstones,
+            "threshold": self.threshold,
+            "runs": self.runs,
+            "removed": self.removed,
+            "last_duration_seconds": self.last_duration,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Item compaction failed")
@@ -0,0 +1,49 @@
+"""Shared fixtures. Run from FastApi/app:  python -m pytest tests"""
+
+import itertools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Set before main is imported: it reads them at import time.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.pop("JOURNAL_DIR", None)
+os.environ.pop("STORAGE_BACKEND", None)
+
+from fastapi.testclient import TestClient
+
+import main
+
+_names = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def register(client):
+    """Register a new user and return ``(username, auth headers)``."""
+
+    def register(password: str = "correct horse"):
+        username = f"user{next(_names)}"
+        response = client.post(
+            "/auth/register",
+            json={
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": password,
+            },
+        )
+        assert response.status_code == 201, response.text
+        response = client.post(
+            "/auth/login", json={"username": username, "password": password}
+        )
+        token = response.json()["access_token"]
+        return username, {"Authorization": f"Bearer {token}"}
+
+    return register
@@ -0,0 +1,58 @@
+import main
+
+
+def test_username_cannot_take_another_users_email(client, register):
+    username, _ = register()
+    response = client.post(
+        "/auth/register",
+        json={
+            "username": f"{username}@example.com",
+            "email": "mallory@example.com",
+            "password": "hunter2",
+        },
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        "/auth/login",
+        json={"username": f"{username}@example.com", "password": "correct horse"},
+    )
+    assert response.status_code == 200
+
+
+def test_email_cannot_match_an_existing_username(client):
+    # Usernames with "@" predate the check at registration.
+    main.users_db.add(
+        {
+            "username": "legacy@example.com",
+            "email": "legacy-owner@example.com",
+            "full_name": None,
+            "hashed_password": main.hash_password("old password"),
+            "disabled": False,
+        }
+    )
+    response = client.post(
+        "/auth/register",
+        json={
+            "username": "newcomer",
+            "email": "legacy@example.com",
+            "password": "hunter2",
+        },
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+
+
+def test_login_by_email_finds_its_owner(client, register):
+    username, _ = register()
+    response = client.post(
+        "/auth/login",
+        json={
+            "username": f"{username.upper()}@Example.com",
+            "password": "correct horse",
+        },
+    )
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.json()["username"] == username
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+
+from store import ItemStore
+
+
+def create(client, headers, *items):
+    response = client.post("/items/bulk", json=list(items), headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["items"]
+
+
+def test_bulk_create_reports_errors_by_index(client, register):
+    _, headers = register()
+    response = client.post(
+        "/items/bulk",
+        json=[{"name": "a", "price": 1}, {"name": "b"}, {"name": "c", "price": 3}],
+        headers=headers,
+    )
+    body = response.json()
+    assert [item["name"] for item in body["items"]] == ["a", "c"]
+    assert [error["index"] for error in body["errors"]] == [1]
+
+
+def test_bulk_patch_applies_patches_in_order(client, register):
+    _, headers = register()
+    item, other = create(
+        client, headers, {"name": "a", "price": 1}, {"name": "b", "price": 2}
+    )
+    response = client.patch(
+        "/items/bulk",
+        json=[
+            {"id": item["id"], "price": 5},
+            {"id": item["id"], "description": "second"},
+            {"id": other["id"] + 1000, "price": 1},
+        ],
+        headers=headers,
+    )
+    body = response.json()
+    assert [(i["id"], i["price"], i["description"]) for i in body["items"]] == [
+        (item["id"], 5, "second")
+    ]
+    assert body["errors"] == [
+        {"index": 2, "id": other["id"] + 1000, "detail": "Item not found"}
+    ]
+
+
+@pytest.mark.parametrize("field", ["name", "price"])
+def test_bulk_patch_rejects_null_for_required_fields(client, register, field):
+    _, headers = register()
+    (item,) = create(client, headers, {"name": "a", "price": 5})
+    response = client.patch(
+        "/items/bulk", json=[{"id": item["id"], field: None}], headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+    assert response.json()["errors"][0]["index"] == 0
+
+    assert client.get(f"/items/{item['id']}", headers=headers).json() == item
+    stats = client.get("/items/stats", headers=headers).json()
+    assert (stats["count"], stats["min_price"], stats["max_price"]) == (1, 5, 5)
+
+
+def test_bulk_patch_can_clear_the_description(client, register):
+    _, headers = register()
+    (item,) = create(client, headers, {"name": "a", "description": "d", "price": 1})
+    response = client.patch(
+        "/items/bulk", json=[{"id": item["id"], "description": None}], headers=headers
+    )
+    assert response.json()["items"][0]["description"] is None
+
+
+def test_bulk_delete_only_removes_own_items(client, register):
+    _, alice = register()
+    _, bob = register()
+    mine = create(client, alice, {"name": "a", "price": 1})[0]
+    theirs = create(client, bob, {"name": "b", "price": 1})[0]
+    response = client.request(
+        "DELETE",
+        "/items/bulk",
+        json={"ids": [mine["id"], theirs["id"]]},
+        headers=alice,
+    )
+    body = response.json()
+    assert body["deleted"] == [mine["id"]]
+    assert [error["index"] for error in body["errors"]] == [1]
+    assert client.get(f"/items/{theirs['id']}", headers=bob).status_code == 200
+
+
+def test_failed_replace_leaves_the_store_unchanged():
+    items = ItemStore()
+    item = items.create(
+        {
+            "name": "a",
+            "description": None,
+            "price": 5.0,
+            "owner": "alice",
+            "created_at": datetime(2024, 1, 1),
+        }
+    )
+    with pytest.raises(TypeError):
+        items.replace(dict(item, price=None))
+    assert items.get(item["id"])["price"] == 5.0
+    assert items.stats("alice")["max_price"] == 5.0
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+import store
+from store import ItemStore
+
+
+def make_item(number, owner="alice"):
+    return {
+        "name": f"item{number}",
+        "description": None,
+        "price": float(number % 7),
+        "owner": owner,
+        "created_at": datetime(2024, 1, 1),
+    }
+
+
+@pytest.mark.parametrize("compact_items", [False, True])
+def test_compaction_drops_tombstones_in_batches(monkeypatch, compact_items):
+    monkeypatch.setattr(store, "COMPACT_BATCH", 3)
+    items = ItemStore(compact_items=compact_items)
+    created = items.create_many([make_item(number) for number in range(40)])
+    gone = items.create_many([make_item(number, "bob") for number in range(5)])
+    items.remove_many([item["id"] for item in created[::2]])
+    items.remove_many([item["id"] for item in gone])
+    items.replace(dict(created[1], price=100.0))
+
+    # 25 dead ids, plus the 20 dead terms of alice's and 5 of bob's.
+    assert items.compact() == 50
+    assert items.tombstones == 0
+    live = [item["id"] for item in created[1::2]]
+    assert [item["id"] for item in items.page_by_owner("alice")] == live
+    assert len(items._prices["alice"]) == len(live)
+    assert items.stats("alice")["max_price"] == 100.0
+    assert "bob" not in items._owner_ids and items.stats("bob")["count"] == 0
+
+    # A deleted id restored after compaction is found again.
+    items.add(created[0])
+    assert items.page_by_owner("alice", limit=1)[0]["id"] == created[0]["id"]
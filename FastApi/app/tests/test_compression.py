@@ -0,0 +1,79 @@
+import asyncio
+import zlib
+
+import pytest
+
+from compression import CompressionMiddleware, choose_encoding
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate", "gzip"),
+        ("deflate;q=1, gzip;q=0.5", "deflate"),
+        ("br, *;q=0.1", "gzip"),
+        ("gzip;q=0, identity", None),
+        ("", None),
+    ],
+)
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_large_pages_are_compressed(client, register):
+    _, headers = register()
+    items = [{"name": f"item {i}", "price": i} for i in range(100)]
+    client.post("/items/bulk", json=items, headers=headers)
+
+    response = client.get("/items", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].startswith("W/")
+    assert len(response.json()) == 100
+    cached = {**headers, "If-None-Match": response.headers["etag"]}
+    assert client.get("/items", headers=cached).status_code == 304
+
+    small = client.get("/items?limit=1", headers={**headers, "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    plain = client.get("/items", headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == response.json()
+
+
+def test_streams_are_compressed_chunk_by_chunk():
+    chunks = [b'{"n": %d}\n' % i * 100 for i in range(3)]
+
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")],
+            }
+        )
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", b"deflate")],
+    }
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, receive, send))
+
+    start, *bodies = sent
+    assert (b"content-encoding", b"deflate") in start["headers"]
+    decoder = zlib.decompressobj()
+    # Each chunk is flushed, so it decodes without waiting for the rest.
+    assert [decoder.decompress(body["body"]) for body in bodies[:3]] == chunks
+    assert not bodies[-1].get("more_body")
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from sqlite_store import SQLiteDatabase, SQLiteItemRepository
+
+
+def test_item_etag_changes_on_update(client, register):
+    _, headers = register()
+    item = client.post("/items", json={"name": "a", "price": 1}, headers=headers)
+    url = f"/items/{item.json()['id']}"
+    etag = client.get(url, headers=headers).headers["ETag"]
+
+    cached = {**headers, "If-None-Match": etag}
+    response = client.get(url, headers=cached)
+    assert response.status_code == 304 and response.headers["ETag"] == etag
+
+    client.put(url, json={"name": "a", "price": 2}, headers=headers)
+    response = client.get(url, headers=cached)
+    assert response.status_code == 200 and response.json()["price"] == 2
+    assert response.headers["ETag"] != etag
+
+
+def test_list_etag_follows_writes_and_query(client, register):
+    _, headers = register()
+    client.post("/items", json={"name": "a", "price": 1}, headers=headers)
+    etag = client.get("/items", headers=headers).headers["ETag"]
+    cached = {**headers, "If-None-Match": f'W/{etag}, "other"'}
+    assert client.get("/items", headers=cached).status_code == 304
+    assert client.get("/items?limit=1", headers=cached).status_code == 200
+
+    client.post("/items", json={"name": "b", "price": 1}, headers=headers)
+    response = client.get("/items", headers=cached)
+    assert response.status_code == 200 and len(response.json()) == 2
+
+
+def test_sqlite_versions_keep_increasing_across_clear(tmp_path):
+    items = SQLiteItemRepository(SQLiteDatabase(str(tmp_path / "items.db")))
+    item = {
+        "name": "a",
+        "description": None,
+        "price": 1.0,
+        "owner": "alice",
+        "created_at": datetime(2024, 1, 1),
+    }
+    items.create(dict(item))
+    items.create(dict(item))
+    before = items.owner_version("alice")
+    items.clear()
+    assert items.owner_version("alice") > before
+    items.create(dict(item))
+    assert items.owner_version("alice") > before + 1
@@ -0,0 +1,75 @@
+import asyncio
+import uuid
+
+import httpx
+
+from idempotency import IdempotencyCache, IdempotencyMiddleware
+
+
+def post_item(client, headers, key, name="lamp"):
+    return client.post(
+        "/items",
+        json={"name": name, "price": 1},
+        headers={**headers, "Idempotency-Key": key},
+    )
+
+
+def test_retry_returns_the_stored_response(client, register):
+    _, headers = register()
+    key = str(uuid.uuid4())
+    first = post_item(client, headers, key)
+    retry = post_item(client, headers, key)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(client.get("/items", headers=headers).json()) == 1
+
+
+def test_key_reused_for_another_body_is_rejected(client, register):
+    _, headers = register()
+    key = str(uuid.uuid4())
+    post_item(client, headers, key)
+    assert post_item(client, headers, key, name="desk").status_code == 422
+    assert post_item(client, headers, "x" * 256).status_code == 400
+
+
+def test_keys_are_scoped_per_user(client, register):
+    _, alice = register()
+    _, bob = register()
+    key = str(uuid.uuid4())
+    assert "idempotent-replayed" not in post_item(client, alice, key).headers
+    assert "idempotent-replayed" not in post_item(client, bob, key).headers
+    assert len(client.get("/items", headers=bob).json()) == 1
+
+
+def test_concurrent_requests_run_once_and_errors_are_not_stored():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await asyncio.sleep(0.01)
+        status = 500 if len(calls) == 2 else 201
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = IdempotencyMiddleware(
+        app, cache=IdempotencyCache(), paths=("/items", "/fail")
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            headers = {"Idempotency-Key": "k"}
+            responses = await asyncio.gather(
+                *(client.post("/items", headers=headers) for _ in range(5))
+            )
+            failed = await client.post("/fail", headers=headers)
+            retried = await client.post("/fail", headers=headers)
+        return responses, failed, retried
+
+    responses, failed, retried = asyncio.run(run())
+    assert [response.status_code for response in responses] == [201] * 5
+    assert (failed.status_code, retried.status_code) == (500, 201)
+    assert calls == ["/items", "/fail", "/fail"]
@@ -0,0 +1,60 @@
+import os
+import threading
+from datetime import datetime
+
+import main
+from changes import ChangeFeed
+from journal import DurableStorage
+from store import ItemStore, UserStore
+
+
+def new_item():
+    return {
+        "name": "item",
+        "description": None,
+        "price": 1.0,
+        "owner": "alice",
+        "created_at": datetime(2024, 1, 1),
+    }
+
+
+def test_owner_writes_share_a_journal_flush(tmp_path, monkeypatch):
+    items = ItemStore()
+    durable = DurableStorage(str(tmp_path), UserStore(), items)
+    durable.open()
+    monkeypatch.setattr(main, "items_db", items)
+    monkeypatch.setattr(main, "change_feed", ChangeFeed())
+
+    # Hold the first flush until both writes have been applied. If a write
+    # kept the owner's feed lock while waiting for its flush, the second
+    # could not get in and this would deadlock until the timeout.
+    release = threading.Event()
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        release.wait(10)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", slow_fsync)
+    writers = [
+        threading.Thread(target=main.write_created, args=("alice", [new_item()]))
+        for _ in range(2)
+    ]
+    try:
+        for writer in writers:
+            writer.start()
+        for _ in range(500):
+            if len(items.page_by_owner("alice")) == 2:
+                break
+            threading.Event().wait(0.01)
+        applied = len(items.page_by_owner("alice"))
+        finished = [not writer.is_alive() for writer in writers]
+    finally:
+        release.set()
+        for writer in writers:
+            writer.join()
+        durable.close()
+
+    assert applied == 2
+    # Neither write returns before its record is durable.
+    assert finished == [False, False]
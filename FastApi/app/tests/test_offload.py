@@ -0,0 +1,39 @@
+import threading
+
+import main
+
+
+def record_threads(monkeypatch, name):
+    """Record which thread each call to ``main.items_db.<name>`` runs on."""
+    threads = []
+    real = getattr(main.items_db, name)
+
+    def wrapper(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(main.items_db, name, wrapper)
+    return threads
+
+
+def on_threadpool(thread_name):
+    return thread_name.startswith("AnyIO worker thread")
+
+
+def test_large_bulk_writes_leave_the_event_loop(client, register, monkeypatch):
+    _, headers = register()
+    created = record_threads(monkeypatch, "create_many")
+    small = [{"name": "a", "price": 1}]
+    large = small * (main.INLINE_ITEMS + 1)
+    client.post("/items/bulk", json=small, headers=headers)
+    client.post("/items/bulk", json=large, headers=headers)
+    assert [on_threadpool(thread) for thread in created] == [False, True]
+
+
+def test_search_leaves_the_event_loop(client, register, monkeypatch):
+    _, headers = register()
+    client.post("/items", json={"name": "lamp", "price": 1}, headers=headers)
+    searched = record_threads(monkeypatch, "search")
+    response = client.get("/items/search", params={"q": "lamp"}, headers=headers)
+    assert [item["name"] for item in response.json()] == ["lamp"]
+    assert [on_threadpool(thread) for thread in searched] == [True]
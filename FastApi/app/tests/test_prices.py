@@ -0,0 +1,121 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from store import ItemStore
+
+JSON = {"Content-Type": "application/json"}
+
+
+def make_item(price, owner="alice"):
+    return {
+        "name": "item",
+        "description": None,
+        "price": price,
+        "owner": owner,
+        "created_at": datetime(2024, 1, 1),
+    }
+
+
+@pytest.mark.parametrize("price", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_prices_are_rejected(client, register, price):
+    _, headers = register()
+    headers = {**headers, **JSON}
+    body = '{"name": "x", "price": %s}' % price
+    assert client.post("/items", content=body, headers=headers).status_code == 422
+
+    item = client.post("/items", json={"name": "x", "price": 1}, headers=headers)
+    item_id = item.json()["id"]
+    response = client.put(f"/items/{item_id}", content=body, headers=headers)
+    assert response.status_code == 422
+
+    response = client.post("/items/bulk", content=f"[{body}]", headers=headers)
+    assert response.json()["items"] == []
+    assert response.json()["errors"][0]["detail"][0]["type"] == "finite_number"
+    patch = '[{"id": %d, "price": %s}]' % (item_id, price)
+    response = client.patch("/items/bulk", content=patch, headers=headers)
+    assert response.json()["items"] == []
+
+    assert client.get("/items/stats", headers=headers).json()["max_price"] == 1
+
+
+@pytest.mark.parametrize(
+    "query", ["min_price=nan", "max_price=inf", "sort=price&cursor=nan:1"]
+)
+def test_non_finite_price_filters_are_rejected(client, register, query):
+    _, headers = register()
+    assert client.get(f"/items?{query}", headers=headers).status_code == 422
+
+
+def test_stats_skips_tombstones_at_both_ends():
+    items = ItemStore()
+    created = items.create_many([make_item(price) for price in (1.0, 2.0, 3.0, 4.0)])
+    items.remove(created[0]["id"])
+    items.remove(created[3]["id"])
+    stats = items.stats("alice")
+    assert (stats["min_price"], stats["max_price"], stats["count"]) == (2.0, 3.0, 2)
+
+    items.replace(dict(created[1], price=9.0))
+    assert (items.stats("alice")["min_price"], items.stats("alice")["max_price"]) == (
+        3.0,
+        9.0,
+    )
+
+
+def test_stats_survives_a_price_index_without_live_entries():
+    items = ItemStore()
+    # Bypasses request validation: NaN never equals its own index key, so
+    # every entry looks like a tombstone.
+    items.create(make_item(float("nan")))
+    stats = items.stats("alice")
+    assert stats["count"] == 1
+    assert stats["min_price"] is None and stats["max_price"] is None
+
+    items.create(make_item(5.0))
+    assert items.stats("alice")["min_price"] == 5.0
+
+
+@pytest.mark.parametrize("low, high", [(40.0, 60.0), (50.0, 50.5), (None, 2.0)])
+@pytest.mark.parametrize("compact_items", [False, True])
+def test_price_filtered_pages_in_id_order(low, high, compact_items):
+    rng = random.Random(7)
+    items = ItemStore(compact_items=compact_items)
+    created = items.create_many(
+        [make_item(round(rng.uniform(1, 100), 2)) for _ in range(5000)]
+    )
+    for item in created[::5]:
+        items.remove(item["id"])
+    expected = [
+        item["id"]
+        for item in created
+        if items.get(item["id"]) is not None
+        and (low is None or item["price"] >= low)
+        and (high is None or item["price"] <= high)
+    ]
+
+    seen, after = [], None
+    while True:
+        page = items.page_by_owner("alice", after, 50, low, high)
+        if not page:
+            break
+        seen.extend(item["id"] for item in page)
+        after = page[-1]["id"]
+    assert seen == expected
+    assert [
+        item["id"] for item in items.page_by_owner("alice", None, None, low, high)
+    ] == expected
+
+
+def test_empty_price_range_reads_nothing(client, register, monkeypatch):
+    items = ItemStore()
+    items.create_many([make_item(float(price)) for price in range(1, 100)])
+    # Any item lookup would now fail.
+    monkeypatch.setattr(items, "_items", None)
+    assert items.page_by_owner("alice", None, 1, 60.0, 40.0) == []
+    assert items.page_by_owner("alice", None, 10, 50.5, 50.6) == []
+
+    _, headers = register()
+    client.post("/items", json={"name": "x", "price": 50}, headers=headers)
+    response = client.get("/items?min_price=60&max_price=40", headers=headers)
+    assert response.status_code == 200 and response.json() == []
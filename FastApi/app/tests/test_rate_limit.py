@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import main
+from rate_limit import RateLimit, RateLimitMiddleware, TokenBucketLimiter
+
+LIMIT = RateLimit(rate=1, burst=5)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain(limiter, key):
+    while limiter.allow("login", key, LIMIT)[0]:
+        pass
+
+
+def test_draining_buckets_are_not_evicted():
+    clock = Clock()
+    limiter = TokenBucketLimiter(max_buckets=2, clock=clock)
+    drain(limiter, "victim")
+    assert limiter.allow("login", "other", LIMIT)[0]
+
+    # The table is full and its oldest bucket is still refilling, so a new
+    # key is refused instead of pushing the victim's bucket out.
+    allowed, retry_after = limiter.allow("login", "attacker", LIMIT)
+    assert not allowed and retry_after == 5.0
+    assert not limiter.allow("login", "victim", LIMIT)[0]
+
+
+def test_refilled_buckets_are_evicted():
+    clock = Clock()
+    limiter = TokenBucketLimiter(max_buckets=2, clock=clock)
+    drain(limiter, "victim")
+    assert limiter.allow("login", "other", LIMIT)[0]
+    clock.now = 5.0
+    assert limiter.allow("login", "newcomer", LIMIT)[0]
+    assert len(limiter) == 2
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def login(middleware, username, ip="10.0.0.1"):
+    body = json.dumps({"username": username}).encode()
+    scope = {"type": "http", "path": "/auth/login", "headers": [], "client": (ip, 1)}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"]
+
+
+def test_login_is_limited_per_client_ip():
+    middleware = RateLimitMiddleware(
+        ok_app,
+        TokenBucketLimiter(clock=Clock()),
+        rules={"/auth/login": LIMIT},
+        body_username_paths=("/auth/login",),
+        client_rules={"/auth/login": RateLimit(rate=1, burst=10)},
+    )
+    # A fresh username each time does not get around the per-IP bucket.
+    statuses = [login(middleware, f"user{i}") for i in range(12)]
+    assert statuses == [200] * 10 + [429] * 2
+    assert login(middleware, "user0", ip="10.0.0.2") == 200
+    # The per-account bucket still applies across addresses.
+    for i in range(4):
+        login(middleware, "user0", ip=f"10.0.1.{i}")
+    assert login(middleware, "user0", ip="10.0.2.1") == 429
+
+
+def test_email_spellings_share_one_login_bucket():
+    middleware = RateLimitMiddleware(
+        ok_app,
+        TokenBucketLimiter(clock=Clock()),
+        rules={"/auth/login": LIMIT},
+        body_username_paths=("/auth/login",),
+        body_username_key=main.login_rate_limit_key,
+    )
+    spellings = ["bob@x.com", "BOB@x.com", "Bob@X.com", " bob@x.com", "bob@x.com "]
+    statuses = [
+        login(middleware, spelling, ip=f"10.0.0.{i}")
+        for i, spelling in enumerate(spellings * 2)
+    ]
+    assert statuses == [200] * 5 + [429] * 5
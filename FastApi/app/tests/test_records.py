@@ -0,0 +1,31 @@
+import random
+
+from records import PriceKeys, VersionTable
+from sorted_list import SortedList
+
+
+def test_price_keys_sort_like_tuples():
+    rng = random.Random(1)
+    keys = SortedList(load=4, chunk=PriceKeys)
+    expected = set()
+    for item_id in range(200):
+        key = (float(rng.randrange(20)), item_id)
+        keys.add(key)
+        expected.add(key)
+    for key in rng.sample(sorted(expected), 50):
+        assert keys.discard(key)
+        expected.discard(key)
+    assert list(keys) == sorted(expected)
+    assert keys[5:9] == sorted(expected)[5:9]
+    assert keys.bisect_left((10.0,)) == sum(key < (10.0,) for key in expected)
+
+
+def test_version_table_acts_like_a_dict():
+    versions = VersionTable()
+    assert versions.get(5, 0) == 0
+    versions[5] = 11
+    versions[5000] = 12
+    assert (versions.get(5), versions.get(5000), versions.get(6)) == (11, 12, None)
+    assert versions.pop(5, None) == 11 and versions.get(5) is None
+    versions.clear()
+    assert versions.get(5000) is None
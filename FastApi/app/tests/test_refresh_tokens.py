@@ -0,0 +1,64 @@
+import main
+
+
+def login(client, username, password="correct horse"):
+    return client.post("/auth/login", json={"username": username, "password": password})
+
+
+def refresh(client, token):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_refresh_rotates_the_token(client, register):
+    username, _ = register()
+    first = login(client, username).json()["refresh_token"]
+    response = refresh(client, first)
+    assert response.status_code == 200
+    second = response.json()["refresh_token"]
+    assert second != first
+
+    access = response.json()["access_token"]
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {access}"})
+    assert me.json()["username"] == username
+    assert refresh(client, second).status_code == 200
+
+
+def test_reusing_a_rotated_token_revokes_its_family(client, register):
+    username, _ = register()
+    first = login(client, username).json()["refresh_token"]
+    second = refresh(client, first).json()["refresh_token"]
+    other_session = login(client, username).json()["refresh_token"]
+
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, second).status_code == 401
+    assert refresh(client, other_session).status_code == 200
+
+
+def test_logout_ends_only_that_session(client, register):
+    username, _ = register()
+    ended = login(client, username).json()["refresh_token"]
+    kept = login(client, username).json()["refresh_token"]
+    response = client.post("/auth/logout", json={"refresh_token": ended})
+    assert response.status_code == 204
+    assert refresh(client, ended).status_code == 401
+    assert refresh(client, kept).status_code == 200
+
+
+def test_disabled_users_get_no_tokens(client, register, monkeypatch):
+    username, _ = register()
+    token = login(client, username).json()["refresh_token"]
+    main.set_user_disabled(username)
+    assert refresh(client, token).status_code == 401
+
+    checked = []
+
+    async def run_hashing(fn, *args):
+        checked.append(fn)
+        return True, None
+
+    monkeypatch.setattr(main, "run_hashing", run_hashing)
+    issued = main.refresh_tokens.stats()
+    assert login(client, username).status_code == 401
+    assert login(client, f"{username}@example.com").status_code == 401
+    assert checked == []
+    assert main.refresh_tokens.stats() == issued
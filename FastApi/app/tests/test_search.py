@@ -0,0 +1,55 @@
+from search import InvertedIndex
+
+
+def search(client, headers, q, **params):
+    response = client.get("/items/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [item["name"] for item in response.json()]
+
+
+def test_search_ranks_name_matches_first(client, register):
+    _, headers = register()
+    items = [
+        {"name": "desk", "description": "a lamp stand", "price": 1},
+        {"name": "lamp", "description": None, "price": 1},
+        {"name": "chair", "description": None, "price": 1},
+    ]
+    client.post("/items/bulk", json=items, headers=headers)
+    assert search(client, headers, "lamp") == ["lamp", "desk"]
+    assert search(client, headers, "lamp stand") == ["desk"]
+    assert search(client, headers, "la") == []
+    assert search(client, headers, "la", prefix=True) == ["lamp", "desk"]
+
+
+def test_search_only_sees_own_current_items(client, register):
+    _, alice = register()
+    _, bob = register()
+    item = client.post("/items", json={"name": "lamp", "price": 1}, headers=alice)
+    client.post("/items", json={"name": "lamp", "price": 1}, headers=bob)
+    assert search(client, alice, "lamp") == ["lamp"]
+
+    item_id = item.json()["id"]
+    client.put(f"/items/{item_id}", json={"name": "sofa", "price": 1}, headers=alice)
+    assert search(client, alice, "lamp") == []
+    client.delete(f"/items/{item_id}", headers=alice)
+    assert search(client, alice, "sofa") == []
+
+
+def test_dead_terms_are_revived_and_compacted():
+    index = InvertedIndex()
+    index.add_many(
+        [
+            {"id": 1, "name": "red lamp", "description": None},
+            {"id": 2, "name": "red chair", "description": None},
+        ]
+    )
+    index.remove(1)
+    assert index.dead_terms == 1
+    assert index.expand("l", prefix=True) == []
+
+    index.add_many([{"id": 3, "name": "lamp", "description": "red"}])
+    assert index.dead_terms == 0
+    index.remove(2)
+    assert index.compact() == 1
+    assert list(index.terms) == ["lamp", "red"]
+    assert [item_id for item_id, _ in index.search("red")] == [3]
@@ -0,0 +1,52 @@
+import random
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import partial
+
+import pytest
+
+from sorted_list import SortedList
+
+
+@pytest.mark.parametrize("load", [2, 5, 1000])
+@pytest.mark.parametrize("chunk", [list, partial(array, "q")])
+def test_matches_a_sorted_list(load, chunk):
+    rng = random.Random(load)
+    values = SortedList(load=load, chunk=chunk)
+    expected = []
+    for _ in range(3000):
+        value = rng.randrange(300)
+        roll = rng.random()
+        if roll < 0.5:
+            assert values.add(value) == (value not in expected)
+            if value not in expected:
+                insort(expected, value)
+        elif roll < 0.6:
+            batch = [rng.randrange(300) for _ in range(rng.randrange(50))]
+            values.update(batch)
+            expected = sorted(set(expected).union(batch))
+        elif roll < 0.8:
+            assert values.discard(value) == (value in expected)
+            if value in expected:
+                expected.remove(value)
+        elif expected:
+            index = rng.randrange(-len(expected), len(expected))
+            assert values.pop(index) == expected.pop(index)
+
+        assert list(values) == expected and len(values) == len(expected)
+        assert values.bisect_left(value) == bisect_left(expected, value)
+        assert values.bisect_right(value) == bisect_right(expected, value)
+        start, stop = rng.randrange(-5, 305), rng.randrange(-5, 305)
+        assert values[start:stop] == expected[start:stop]
+        if expected:
+            index = rng.randrange(-len(expected), len(expected))
+            assert values[index] == expected[index]
+
+
+def test_rejects_out_of_range_positions():
+    values = SortedList([3, 1, 2])
+    assert list(values) == [1, 2, 3]
+    with pytest.raises(IndexError):
+        values[3]
+    with pytest.raises(IndexError):
+        SortedList().pop()
@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from sqlite_store import SQLiteDatabase, SQLiteItemRepository, SQLiteUserRepository
+from store import ItemStore
+
+
+def make_item(name, price, owner="alice", description=None):
+    return {
+        "name": name,
+        "description": description,
+        "price": price,
+        "owner": owner,
+        "created_at": datetime(2024, 1, 1, 12, 30),
+    }
+
+
+def make_user(username, email):
+    return {
+        "username": username,
+        "email": email,
+        "full_name": None,
+        "hashed_password": "hash",
+        "disabled": False,
+    }
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "app.db"))
+    yield db
+    db.close()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def items(request, db):
+    """The same tests run against both backends."""
+    if request.param == "memory":
+        return ItemStore()
+    return SQLiteItemRepository(db)
+
+
+def test_items_round_trip(items):
+    created = items.create_many(
+        [make_item("red lamp", 30.0), make_item("chair", 10.0, description="red")]
+    )
+    items.create(make_item("sofa", 20.0, owner="bob"))
+    lamp, chair = created
+    assert items.get(lamp["id"]) == lamp
+    assert items.get(lamp["id"])["created_at"] == datetime(2024, 1, 1, 12, 30)
+    assert items.get_many([chair["id"], 10**9]) == {chair["id"]: chair}
+
+    assert [item["name"] for item in items.page_by_owner("alice")] == [
+        "red lamp",
+        "chair",
+    ]
+    assert [i["name"] for i in items.page_by_owner("alice", lamp["id"])] == ["chair"]
+    assert [i["name"] for i in items.page_by_price("alice", max_price=20.0)] == [
+        "chair"
+    ]
+    assert [item["name"] for item in items.search("alice", "red")] == [
+        "red lamp",
+        "chair",
+    ]
+    stats = items.stats("alice")
+    assert (stats["count"], stats["total_price"], stats["min_price"]) == (2, 40.0, 10.0)
+
+
+def test_item_writes(items):
+    lamp, chair = items.create_many([make_item("lamp", 30.0), make_item("chair", 10.0)])
+    version = items.owner_version("alice")
+    replaced = items.replace_many(
+        [dict(lamp, price=5.0), dict(chair, id=10**9, name="gone")]
+    )
+    assert [item["id"] for item in replaced] == [lamp["id"]]
+    assert items.owner_version("alice") > version
+    assert items.stats("alice")["min_price"] == 5.0
+
+    items.remove_many([lamp["id"]])
+    assert items.get(lamp["id"]) is None
+    assert items.remove(chair["id"])["name"] == "chair"
+    assert items.page_by_owner("alice") == []
+    assert items.stats("alice")["count"] == 0
+
+
+def test_user_emails_are_unique_in_any_spelling(db):
+    users = SQLiteUserRepository(db)
+    assert users.add(make_user("ann", "Ann@Example.com"))
+    assert not users.add(make_user("other", " ann@example.COM "))
+    assert not users.add(make_user("ann", "fresh@example.com"))
+    assert users.get_by_email("ANN@example.com")["username"] == "ann"
+    users.set_disabled("ann", True)
+    assert users.get("ann")["disabled"] is True
+
+
+def test_workers_can_open_one_file_together(tmp_path):
+    path = str(tmp_path / "shared.db")
+    errors = []
+
+    def open_database():
+        try:
+            SQLiteDatabase(path).close()
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=open_database) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    items = SQLiteItemRepository(SQLiteDatabase(path))
+    assert items.create(make_item("lamp", 1.0))["id"] == 1
@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+
+class TokenCache:
+    """Bounded LRU cache of verified bearer tokens.
+
+    Maps a raw token to its decoded payload and the ``User`` built from it,
+    so repeated requests with the same token skip ``jwt.decode`` and model
+    construction. An entry is dropped once the token's ``exp`` passes, and
+    all entries for a user can be invalidated when that user changes.
+    """
+
+    def __init__(self, maxsize: int = 10_000, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[dict, Any, float]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Tuple[dict, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, user, expires_at = entry
+            if expires_at <= self._clock():
+                self._discard(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return payload, user
+
+    def username_for(self, token: str) -> Optional[str]:
+        """Return the user of a cached, unexpired token without counting a hit."""
+        entry = self._entries.get(token)
+        if entry is None or entry[2] <= self._clock():
+            return None
+        return entry[0]["sub"]
+
+    def put(self, token: str, payload: dict, user: Any) -> None:
+        expires_at = payload.get("exp")
+        if expires_at is None:
+            # Tokens without an expiry are never cached.
+            return
+        username = payload["sub"]
+        with self._lock:
+            self._discard(token)
+            self._entries[token] = (payload, user, float(expires_at))
+            self._by_user.setdefault(username, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, username: str) -> None:
+        with self._lock:
+            for token in self._by_user.pop(username, ()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _discard(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        username = entry[0]["sub"]
+        tokens = self._by_user.get(username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[username]
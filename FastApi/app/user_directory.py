@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Generic, Optional, TypeVar
+
+from repository import UserRepository
+
+V = TypeVar("V")
+
+
+class UserDirectory(Generic[V]):
+    """Read-through cache of immutable user views over a ``UserRepository``.
+
+    ``build`` turns a stored user into its view (the API's frozen ``User``
+    model), once per change rather than once per request. Writes must go
+    through the directory so the cached view is dropped with them.
+
+    A view loaded while the same user was being changed is not cached, so
+    a slow read can never put back the state from before a write. The
+    cache is per process: with several workers sharing SQLite, a change
+    made by another worker shows up here once the entry is evicted.
+    """
+
+    def __init__(
+        self,
+        users: UserRepository,
+        build: Callable[[dict], V],
+        maxsize: int = 10_000,
+    ):
+        self.users = users
+        self.build = build
+        self.maxsize = maxsize
+        self._views: "OrderedDict[str, V]" = OrderedDict()
+        self._lock = Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def cached(self, username: str) -> Optional[V]:
+        """Return the user's view if it is cached, without touching storage."""
+        with self._lock:
+            view = self._views.get(username)
+            if view is not None:
+                self._views.move_to_end(username)
+                self.hits += 1
+            return view
+
+    def get(self, username: str) -> Optional[V]:
+        """Return the user's view, loading and caching it on a miss."""
+        view = self.cached(username)
+        if view is not None:
+            return view
+        with self._lock:
+            self.misses += 1
+            generation = self._generation
+        user_data = self.users.get(username)
+        if user_data is None:
+            return None
+        view = self.build(user_data)
+        with self._lock:
+            if self._generation == generation:
+                self._views[username] = view
+                while len(self._views) > self.maxsize:
+                    self._views.popitem(last=False)
+        return view
+
+    def find(self, login: str) -> Optional[dict]:
+        """Return the stored user for a username, or failing that an email."""
+        user_data = self.users.get(login)
+        if user_data is None and "@" in login:
+            user_data = self.users.get_by_email(login)
+        return user_data
+
+    def add(self, user_data: dict) -> bool:
+        added = self.users.add(user_data)
+        self.invalidate(user_data["username"])
+        return added
+
+    def set_disabled(self, username: str, disabled: bool) -> None:
+        self.users.set_disabled(username, disabled)
+        self.invalidate(username)
+
+    def set_hashed_password(self, username: str, hashed_password: str) -> None:
+        # Views hold no password, so there is nothing to drop.
+        self.users.set_hashed_password(username, hashed_password)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._views.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._views.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._views),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }